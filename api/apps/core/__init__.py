@@ -0,0 +1 @@
+default_app_config = 'apps.core.apps.CoreConfig'
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""
+Bloom filter: a fixed-size bit array answering "definitely not added" or
+"maybe added" for strings. Used as a cheap front for exact lookups whose
+answer is almost always no (see apps.usr.tokens).
+"""
+import math
+import hashlib
+
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(1, capacity)
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, value):
+        # double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self.positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(value))
+
+    @property
+    def full(self):
+        """Past capacity the false-positive rate climbs above error_rate."""
+        return self.count > self.capacity
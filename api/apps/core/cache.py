@@ -0,0 +1,139 @@
+"""
+Namespaced, versioned keys on the shared cache.
+
+A Namespace prefixes its keys with its name and a generation number that
+lives in the cache itself. invalidate() bumps the generation, which
+orphans every key of the namespace (or of one scope in it, e.g. one
+purchase request) on every worker at once; orphaned entries just expire.
+Generations start from the clock rather than 0, so an evicted generation
+key never brings old entries back.
+
+Hits and misses are counted per process and added to shared counters
+every STATS_FLUSH_SECONDS; `manage.py cache_stats` reports them.
+"""
+import time
+from django.core.cache import caches
+
+
+STATS_FLUSH_SECONDS = 10
+REGISTRY_KEY = "cache-stats:namespaces"
+
+_MISSING = object()
+_DEFAULT_TIMEOUT = object()
+
+
+
+def fresh_generation():
+    return time.time_ns() // 1000
+
+
+class Namespace:
+    def __init__(self, name, timeout=300, alias="default"):
+        self.name = name
+        self.timeout = timeout
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self.flushed_at = 0.0  # the first lookup registers the namespace
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    # ----------------- GENERATIONS -----------------
+    def generation_key(self, scope=None):
+        return f"{self.name}:gen" if scope is None else f"{self.name}:{scope}:gen"
+
+    def generations(self, scope=None):
+        """(namespace generation[, scope generation]) in one round trip, creating missing ones."""
+        keys = [self.generation_key()] + ([] if scope is None else [self.generation_key(scope)])
+        found = self.cache.get_many(keys)
+        for key in keys:
+            if key not in found:
+                self.cache.add(key, fresh_generation(), timeout=None)
+                found[key] = self.cache.get(key)
+        return [found[key] for key in keys]
+
+    def generation(self, scope=None):
+        return self.generations(scope)[-1]
+
+    def invalidate(self, scope=None):
+        """Orphan every key of the namespace, or of one scope in it."""
+        key = self.generation_key(scope)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, fresh_generation(), timeout=None)
+
+    def key(self, key, scope=None):
+        generations = self.generations(scope)
+        if scope is None:
+            return f"{self.name}:{generations[0]}:{key}"
+        return f"{self.name}:{generations[0]}:{scope}:{generations[1]}:{key}"
+
+    # ----------------- VALUES -----------------
+    def get(self, key, default=None, scope=None):
+        value = self.cache.get(self.key(key, scope), _MISSING)
+        self.count(value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, scope=None, timeout=_DEFAULT_TIMEOUT):
+        self.cache.set(self.key(key, scope), value, self.timeout if timeout is _DEFAULT_TIMEOUT else timeout)
+
+    def get_or_set(self, key, compute, scope=None, cacheable=None):
+        """
+        Cached value of `key`, computing and storing it on a miss (None is
+        cached too) unless `cacheable(value)` says no. The generation is read
+        before computing, so an invalidation meanwhile orphans the result.
+        """
+        full_key = self.key(key, scope)
+        value = self.cache.get(full_key, _MISSING)
+        self.count(value is not _MISSING)
+        if value is _MISSING:
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.cache.set(full_key, value, self.timeout)
+        return value
+
+    def delete(self, key, scope=None):
+        self.cache.delete(self.key(key, scope))
+
+    # ----------------- METRICS -----------------
+    def count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if time.monotonic() - self.flushed_at > STATS_FLUSH_SECONDS:
+            self.flush_stats()
+
+    def flush_stats(self):
+        hits, misses, self.hits, self.misses = self.hits, self.misses, 0, 0
+        self.flushed_at = time.monotonic()
+        for counter, value in (("hits", hits), ("misses", misses)):
+            if value:
+                key = f"cache-stats:{self.name}:{counter}"
+                if not self.cache.add(key, value, timeout=None):
+                    self.cache.incr(key, value)
+
+        names = self.cache.get(REGISTRY_KEY, [])
+        if self.name not in names:
+            self.cache.set(REGISTRY_KEY, sorted({*names, self.name}), timeout=None)
+
+
+def stats(alias="default"):
+    """{namespace: {"hits", "misses", "hit_ratio"}} summed over every process that flushed."""
+    cache = caches[alias]
+    report = {}
+    for name in cache.get(REGISTRY_KEY, []):
+        counters = cache.get_many([f"cache-stats:{name}:hits", f"cache-stats:{name}:misses"])
+        hits = counters.get(f"cache-stats:{name}:hits", 0)
+        misses = counters.get(f"cache-stats:{name}:misses", 0)
+        report[name] = {"hits": hits, "misses": misses, "hit_ratio": hits / (hits + misses) if hits + misses else None}
+    return report
+
+
+def reset_stats(alias="default"):
+    cache = caches[alias]
+    names = cache.get(REGISTRY_KEY, [])
+    cache.delete_many([f"cache-stats:{name}:{counter}" for name in names for counter in ("hits", "misses")])
@@ -0,0 +1,108 @@
+"""
+Read replicas. Reads go to the primary unless a view opted in with
+ReplicaReadMixin; writes and migrations always go to the primary. After a
+user's own write, StickyPrimaryMiddleware sets a short-lived cookie that
+keeps their reads on the primary until replication has caught up.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+
+
+PRIMARY = "default"
+STICKY_COOKIE = "db_primary"
+
+# picked once per request, so all of a request's reads see one replica's state
+_read_alias = ContextVar("db_read_alias", default=PRIMARY)
+
+
+
+def replicas():
+    return settings.DATABASE_REPLICAS
+
+
+def read_alias():
+    """Database the current context reads from. Pin lazily evaluated querysets with `.using(read_alias())`."""
+    return _read_alias.get()
+
+
+def pick_replica():
+    return random.choice(replicas()) if replicas() else PRIMARY
+
+
+@contextmanager
+def reads_from_replica(enabled=True):
+    token = _read_alias.set(pick_replica() if enabled else PRIMARY)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db  # related lookups stay on the database the row came from
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+
+# ----------------- VIEWS -----------------
+def is_sticky(request):
+    return request.COOKIES.get(STICKY_COOKIE) == "1"
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests (and `replica_actions`) from a replica, unless the
+    user wrote something in the last DATABASE_REPLICA_STICKY_SECONDS.
+    `primary_actions` always read the primary.
+    """
+    replica_actions = ()
+    primary_actions = ()
+    _replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        # authentication and permission checks above still read the primary
+        super().initial(request, *args, **kwargs)
+        action = getattr(self, "action", None)
+        safe = request.method in ("GET", "HEAD") or action in self.replica_actions
+        if safe and action not in self.primary_actions and not is_sticky(request):
+            self._replica_token = _read_alias.set(pick_replica())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._replica_token is not None:
+            _read_alias.reset(self._replica_token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class StickyPrimaryMiddleware:
+    """After a write (even a refused one, e.g. a 412), pin the user's reads to the primary for a few seconds."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE") and response.status_code < 500 and replicas():
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+                httponly=True,
+                secure=settings.JWT_COOKIE_SECURE,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,125 @@
+import hashlib
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.core.models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# a claim older than this whose response never got stored belongs to a worker that died
+STALE_CLAIM_SECONDS = 300
+
+
+
+def fingerprint(request):
+    """sha256 of method, path and parsed body; uploaded files by content."""
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    data = request.data
+    if hasattr(data, "lists"):  # form and multipart bodies
+        items = [(name, part) for name, values in data.lists() for part in values]
+    elif isinstance(data, dict):
+        items = list(data.items())
+    else:
+        items = [("", data)]
+
+    for name, part in sorted(items, key=lambda item: item[0]):
+        digest.update(f"{name}=".encode())
+        if isinstance(part, UploadedFile):
+            digest.update(f"{part.name}:{part.size}:".encode())
+            for chunk in part.chunks():
+                digest.update(chunk)
+            part.seek(0)
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def claim(user, key, request_fingerprint):
+    """The stored row for (user, key), creating an in-progress one if there is none. Returns (row, created)."""
+    now = timezone.now()
+    expires_at = now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    IdempotencyKey.objects.filter(user=user, key=key, expires_at__lte=now).delete()
+    IdempotencyKey.objects.filter(
+        user=user, key=key, response_status__isnull=True, created_at__lte=now - timedelta(seconds=STALE_CLAIM_SECONDS)
+    ).delete()
+    try:
+        with transaction.atomic():
+            row = IdempotencyKey.objects.create(user=user, key=key, fingerprint=request_fingerprint, expires_at=expires_at)
+        return row, True
+    except IntegrityError:
+        row = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if row is None:  # expired and purged in between
+            return claim(user, key, request_fingerprint)
+        return row, False
+
+
+def idempotent(view_method):
+    """
+    Answer retries of a write from storage. A request carrying an
+    Idempotency-Key runs once per (user, key); repeats within
+    IDEMPOTENCY_KEY_TTL_HOURS get the stored response. 5xx responses and
+    exceptions are not stored, so the client can retry them.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        request_fingerprint = fingerprint(request)
+        row, created = claim(request.user, key, request_fingerprint)
+        if not created:
+            if row.fingerprint != request_fingerprint:
+                return Response(
+                    {"error": f"This {HEADER} was already used for a different request."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if row.response_status is None:
+                return Response(
+                    {"error": f"A request with this {HEADER} is still being processed."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            response = Response(row.response_data, status=row.response_status)
+            response["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            # the writes and their stored response commit together, or neither does
+            with transaction.atomic():
+                # locked, so a worker taking over stale claims waits for this one to finish
+                if not IdempotencyKey.objects.select_for_update().filter(pk=row.pk, response_status__isnull=True).exists():
+                    return Response(
+                        {"error": f"A request with this {HEADER} is still being processed."},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    row.response_status = response.status_code
+                    row.response_data = response.data
+                    row.save(update_fields=["response_status", "response_data"])
+        except Exception:
+            row.delete()
+            raise
+
+        if response.status_code >= 500:
+            row.delete()
+        return response
+
+    return wrapper
+
+
+def purge_expired():
+    return IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()[0]
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.cache import STATS_FLUSH_SECONDS, reset_stats, stats
+
+
+
+class Command(BaseCommand):
+    help = "Hit/miss counts of the application cache namespaces, summed over all processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after printing them.")
+
+    def handle(self, *args, **options):
+        report = stats()
+        if not report:
+            self.stdout.write(f"No cache lookups recorded yet (processes report every {STATS_FLUSH_SECONDS}s).")
+        for name, counters in sorted(report.items()):
+            ratio = counters["hit_ratio"]
+            self.stdout.write(
+                f"{name:<24} hits={counters['hits']:<10} misses={counters['misses']:<10} "
+                f"hit ratio={'-' if ratio is None else f'{ratio:.1%}'}"
+            )
+
+        if options["reset"]:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
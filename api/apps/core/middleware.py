@@ -0,0 +1,43 @@
+"""
+Web-only versions of Django's session stack. The API authenticates with the
+JWT cookie (apps.usr.authentication) and DRF sets request.user itself, so
+requests under API_PATH_PREFIX skip sessions, CSRF, session auth and
+messages; the admin keeps all of them.
+"""
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+
+
+
+def is_api_request(request):
+    return request.path_info.startswith(settings.API_PATH_PREFIX)
+
+
+class WebOnlyMixin:
+    def __call__(self, request):
+        if is_api_request(request):
+            return self.get_response(request)  # a coroutine when the stack runs async, like super()'s
+        return super().__call__(request)
+
+
+class WebOnlySessionMiddleware(WebOnlyMixin, SessionMiddleware):
+    pass
+
+
+class WebOnlyCsrfViewMiddleware(WebOnlyMixin, CsrfViewMiddleware):
+    # the handler calls process_view directly, outside __call__
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_api_request(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class WebOnlyAuthenticationMiddleware(WebOnlyMixin, AuthenticationMiddleware):
+    pass
+
+
+class WebOnlyMessageMiddleware(WebOnlyMixin, MessageMiddleware):
+    pass
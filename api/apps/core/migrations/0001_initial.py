@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:03
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='Key')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Request Fingerprint')),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Response Status')),
+                ('response_data', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Response Data')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('expires_at', models.DateTimeField(verbose_name='Expires At')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='idempotency_expires_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'key'), name='idempotency_key_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+
+# Stored outcome of a write sent with an Idempotency-Key header (see apps.core.idempotency)
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="idempotency_keys", verbose_name="User")
+    key = models.CharField(max_length=255, verbose_name="Key")
+    fingerprint = models.CharField(max_length=64, verbose_name="Request Fingerprint")  # sha256 of method, path and body
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Response Status")  # null while in progress
+    response_data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Response Data")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    expires_at = models.DateTimeField(verbose_name="Expires At")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="idempotency_key_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
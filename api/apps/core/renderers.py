@@ -0,0 +1,42 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_drf_encoder = JSONEncoder()
+
+
+def default(obj):
+    # whatever orjson can't take natively (Decimal, datetimes for DRF's "Z" /
+    # millisecond format, ...) is encoded as JSONRenderer would, so a raw
+    # Decimal is a number (`1.5`) on both; serializer DecimalFields are strings already
+    return _drf_encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson. For compact responses the output is the same
+    JSON as the stdlib renderer's, with two differences in floats:
+    exponents have no "+" (`1e16`, where json writes `1e+16`), and NaN and
+    Infinity render as null, where JSONRenderer (STRICT_JSON) raises
+    ValueError. Serializers here send decimals as strings, so neither
+    reaches the API today. Indented or ASCII-only output (browsable API,
+    `; indent=` in Accept) and anything orjson rejects are delegated to
+    the stdlib renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # same JavaScript-safe escaping of U+2028 / U+2029 as JSONRenderer
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
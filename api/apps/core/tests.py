@@ -0,0 +1,40 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.core.db import PRIMARY, STICKY_COOKIE, ReplicaRouter, StickyPrimaryMiddleware, read_alias, reads_from_replica
+from apps.usr.models import User
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_go_to_the_primary_unless_opted_in(self):
+        self.assertEqual(self.router.db_for_read(User), PRIMARY)
+        with reads_from_replica():
+            self.assertEqual(self.router.db_for_read(User), "replica_1")
+        with reads_from_replica(enabled=False):
+            self.assertEqual(read_alias(), PRIMARY)
+        self.assertEqual(read_alias(), PRIMARY)
+
+    def test_writes_and_migrations_go_to_the_primary(self):
+        with reads_from_replica():
+            self.assertEqual(self.router.db_for_write(User), PRIMARY)
+        self.assertFalse(self.router.allow_migrate("replica_1", "usr"))
+
+    def test_related_lookups_stay_on_the_rows_database(self):
+        user = User()
+        user._state.db = PRIMARY
+        with reads_from_replica():
+            self.assertEqual(self.router.db_for_read(User, instance=user), PRIMARY)
+
+    def test_writes_pin_reads_to_the_primary(self):
+        middleware = StickyPrimaryMiddleware(lambda request: HttpResponse(status=412))
+        self.assertIn(STICKY_COOKIE, middleware(RequestFactory().patch("/api/purchases/requests/1/")).cookies)
+        self.assertNotIn(STICKY_COOKIE, middleware(RequestFactory().get("/api/purchases/requests/1/")).cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_cookie_without_replicas(self):
+        middleware = StickyPrimaryMiddleware(lambda request: HttpResponse())
+        self.assertNotIn(STICKY_COOKIE, middleware(RequestFactory().post("/api/purchases/requests/")).cookies)
@@ -0,0 +1,39 @@
+"""
+Batched on_commit work. A batch collects the items written at one
+savepoint level of the current transaction and runs once, after commit.
+Batches are registered with transaction.on_commit and only weakly
+referenced here: when Django drops the callbacks of a rolled-back
+savepoint (or transaction), the batch and its items go with them.
+"""
+import threading
+import weakref
+from django.db import transaction
+
+
+_registry = threading.local()
+
+
+
+def add_on_commit(batch_class, item, using=None):
+    """
+    Add `item` to the `batch_class()` instance of the current savepoint,
+    creating and registering it on first use. A batch needs `add(item)` and
+    `__call__()`; outside an atomic block it runs right away.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        batch = batch_class()
+        batch.add(item)
+        batch()
+        return
+
+    batches = getattr(_registry, "batches", None)
+    if batches is None:
+        batches = _registry.batches = weakref.WeakValueDictionary()
+
+    key = (connection.alias, batch_class, tuple(connection.savepoint_ids))
+    batch = batches.get(key)
+    if batch is None:
+        batch = batches[key] = batch_class()
+        transaction.on_commit(batch, using=connection.alias)
+    batch.add(item)
@@ -1,10 +1,73 @@
+import json
 from django.contrib import admin
+from django.contrib.postgres.search import SearchQuery
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
 from django.utils.html import format_html
+from apps.purchases.search import SEARCH_CONFIG, search_requests
 from .models import (
-    ApprovalPolicy, PurchaseRequest, RequestItem, ApprovalStep, FinanceNote
+    ApprovalPolicy, PurchaseRequest, RequestItem, ApprovalStep, FinanceNote, OutboxEvent, ArchivedPurchaseRequest, AuditEvent,
+    PolicyReapplication, ApproverPool, ApprovalAssignment,
 )
 
 
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator that skips COUNT(*) on large tables: the planner's
+    row estimate is used (pg_class.reltuples when unfiltered, EXPLAIN when
+    filtered) and an exact count only when that estimate is small.
+    """
+    EXACT_COUNT_BELOW = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return super().count
+
+        estimate = -1
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [connection.ops.quote_name(queryset.model._meta.db_table)],
+                )
+                estimate = cursor.fetchone()[0]
+            if estimate < 0:  # filtered, never analyzed, or a partitioned parent
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                estimate = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]["Plan Rows"]
+
+        if estimate < self.EXACT_COUNT_BELOW:
+            return super().count
+        return int(estimate)
+
+
+class TunedChangelistMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # no second, unfiltered COUNT(*) next to filtered results
+
+
+class ApprovalLevelFilter(admin.SimpleListFilter):
+    # the default field filter runs SELECT DISTINCT level over every step
+    title = "level"
+    parameter_name = "level"
+
+    def lookups(self, request, model_admin):
+        levels = ApprovalPolicy.objects.aggregate(Max("required_approval_levels"))["required_approval_levels__max"] or 1
+        return [(str(level), str(level)) for level in range(1, levels + 1)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(level=self.value())
+        return queryset
+
+
 class RequestItemInline(admin.TabularInline):
     model = RequestItem
     extra = 1
@@ -12,19 +75,22 @@ class RequestItemInline(admin.TabularInline):
 class ApprovalStepInline(admin.TabularInline):
     model = ApprovalStep
     extra = 1
+    autocomplete_fields = ["approver"]
     readonly_fields = ["level", "created_at"]
 
 
 @admin.register(ApprovalPolicy)
 class ApprovalPolicyAdmin(admin.ModelAdmin):
-    list_display = ["title", "min_amount", "max_amount", "required_approval_levels", "active", "created_at"]
-    list_filter = ["active"]
+    list_display = ["title", "department", "category", "min_amount", "max_amount", "required_approval_levels", "active", "created_at"]
+    list_filter = ["active", "department", "category"]
     search_fields = ["title"]
 
 
 @admin.register(PurchaseRequest)
-class PurchaseRequestAdmin(admin.ModelAdmin):
+class PurchaseRequestAdmin(TunedChangelistMixin, admin.ModelAdmin):
     list_display = ("title", "created_by", "amount", "status", "required_approval_levels", "created_at")
+    list_select_related = ("created_by",)
+    autocomplete_fields = ("created_by",)
     search_fields = ("title", "created_by__first_name", "created_by__last_name", "created_by__email")
     list_filter = ("status",)
     ordering = ("-created_at",)
@@ -32,26 +98,114 @@ class PurchaseRequestAdmin(admin.ModelAdmin):
     exclude = ["required_approval_levels"]
     inlines = [RequestItemInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        # search_vector (GIN) instead of ILIKE across the joined user table
+        if not search_term:
+            return queryset, False
+        return search_requests(queryset, search_term.strip()), False
+
 
 @admin.register(RequestItem)
-class RequestItemAdmin(admin.ModelAdmin):
+class RequestItemAdmin(TunedChangelistMixin, admin.ModelAdmin):
     list_display = ("item_name", "qty", "price", "total_price", "purchase_request")
+    list_select_related = ("purchase_request",)
+    raw_id_fields = ("purchase_request",)
     search_fields = ("item_name", "purchase_request__title")
-    ordering = ("purchase_request",)
+    ordering = ("-purchase_request", "-pk")
+
+    def get_search_results(self, request, queryset, search_term):
+        # item_name ILIKE is served by the trigram index; parent titles by the request search_vector
+        if not search_term:
+            return queryset, False
+        matching_requests = PurchaseRequest.objects.filter(
+            search_vector=SearchQuery(search_term, search_type="websearch", config=SEARCH_CONFIG)
+        ).values("pk")
+        return queryset.filter(Q(item_name__icontains=search_term) | Q(purchase_request__in=matching_requests)), False
 
 
 @admin.register(ApprovalStep)
-class ApprovalStepAdmin(admin.ModelAdmin):
+class ApprovalStepAdmin(TunedChangelistMixin, admin.ModelAdmin):
     list_display = ("purchase_request", "level", "approver", "status", "created_at")
+    list_select_related = ("purchase_request", "approver")
+    raw_id_fields = ("purchase_request",)
+    autocomplete_fields = ("approver",)
     search_fields = ("purchase_request__title", "approver__first_name", "approver__last_name", "approver__email",)
-    list_filter = ("status", "level",)
+    list_filter = ("status", ApprovalLevelFilter)
     ordering = ("purchase_request", "level")
     readonly_fields = ["level", "created_at"]
 
 
 @admin.register(FinanceNote)
-class FinanceNoteAdmin(admin.ModelAdmin):
+class FinanceNoteAdmin(TunedChangelistMixin, admin.ModelAdmin):
     list_display = ("purchase_request", "finance_user", "created_at")
+    list_select_related = ("purchase_request", "finance_user")
+    raw_id_fields = ("purchase_request",)
+    autocomplete_fields = ("finance_user",)
     search_fields = ("finance_user__first_name", "finance_user__last_name", "finance_user__email", "purchase_request__title")
-    ordering = ("-created_at",)
+    ordering = ("-pk",)  # insertion order via the primary key; created_at is not indexed
     readonly_fields = ("created_at",)
+
+
+@admin.register(ApproverPool)
+class ApproverPoolAdmin(admin.ModelAdmin):
+    list_display = ("name", "level", "department", "active", "created_at")
+    list_filter = ("active", "level")
+    search_fields = ("name", "department")
+    autocomplete_fields = ("members",)
+    ordering = ("level", "department")
+
+
+@admin.register(ApprovalAssignment)
+class ApprovalAssignmentAdmin(TunedChangelistMixin, admin.ModelAdmin):
+    list_display = ("purchase_request", "level", "approver", "pool", "status", "created_at", "closed_at")
+    list_select_related = ("purchase_request", "approver", "pool")
+    list_filter = ("status",)
+    raw_id_fields = ("purchase_request",)
+    autocomplete_fields = ("approver",)
+    ordering = ("-pk",)
+
+
+@admin.register(ArchivedPurchaseRequest)
+class ArchivedPurchaseRequestAdmin(TunedChangelistMixin, admin.ModelAdmin):
+    list_display = ("id", "title", "created_by", "amount", "status", "created_at", "archived_at")
+    list_select_related = ("created_by",)
+    list_filter = ("status",)
+    ordering = ("-created_at",)
+    readonly_fields = ("id", "created_by", "title", "amount", "status", "data", "created_at", "archived_at")
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(TunedChangelistMixin, admin.ModelAdmin):
+    list_display = ("topic", "status", "attempts", "available_at", "processed_at", "created_at")
+    list_filter = ("status", "topic")
+    ordering = ("-pk",)
+    readonly_fields = ("topic", "payload", "attempts", "last_error", "processed_at", "created_at")
+
+
+@admin.register(PolicyReapplication)
+class PolicyReapplicationAdmin(admin.ModelAdmin):
+    list_display = ("reason", "status", "processed", "total", "changed", "approved", "created_at", "finished_at")
+    list_filter = ("status",)
+    ordering = ("-pk",)
+    readonly_fields = (
+        "reason", "status", "total", "processed", "changed", "approved", "last_id", "error",
+        "created_at", "started_at", "finished_at",
+    )
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(TunedChangelistMixin, admin.ModelAdmin):
+    list_display = ("purchase_request_id", "model", "object_id", "action", "actor", "created_at")
+    list_select_related = ("actor",)
+    list_filter = ("action", "model")
+    ordering = ("-id",)
+
+    # append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
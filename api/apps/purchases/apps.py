@@ -6,4 +6,5 @@ class PurchasesConfig(AppConfig):
     name = 'apps.purchases'
     
     def ready(self):
-            import apps.purchases.controller.signals
\ No newline at end of file
+            import apps.purchases.controller.signals
+            import apps.purchases.controller.handlers
\ No newline at end of file
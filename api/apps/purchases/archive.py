@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models import Prefetch
+
+from apps.purchases.audit import deletes_recorded_as
+from apps.purchases.constants import PurchaseStatus, AuditAction
+from apps.purchases.models import PurchaseRequest, ArchivedPurchaseRequest, ApprovalStep, FinanceNote
+from apps.purchases.serializers import PurchaseRequestSerializer
+
+
+FINAL_STATUSES = [PurchaseStatus.APPROVED, PurchaseStatus.REJECTED]
+FILE_FIELDS = ["proforma_invoice", "purchase_order", "receipt"]
+
+
+
+def archivable_requests(before):
+    # (status, created_at) index
+    return PurchaseRequest.objects.filter(status__in=FINAL_STATUSES, created_at__lt=before)
+
+
+def archive_batch(before, batch_size=500):
+    """
+    Move one batch of finalized requests (with items, steps and notes)
+    into ArchivedPurchaseRequest. Returns the number archived; 0 when done.
+    """
+    with transaction.atomic():
+        ids = list(
+            archivable_requests(before)
+            .select_for_update(skip_locked=True)
+            .order_by("created_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        requests = (
+            PurchaseRequest.objects.filter(pk__in=ids)
+            .select_related("created_by")
+            .prefetch_related(
+                "items",
+                Prefetch("approval_steps", queryset=ApprovalStep.objects.select_related("approver")),
+                Prefetch("finance_notes", queryset=FinanceNote.objects.select_related("finance_user")),
+            )
+        )
+        ArchivedPurchaseRequest.objects.bulk_create([
+            ArchivedPurchaseRequest(
+                id=pr.pk,
+                created_by_id=pr.created_by_id,
+                title=pr.title,
+                amount=pr.amount,
+                status=pr.status,
+                created_at=pr.created_at,
+                data=PurchaseRequestSerializer(pr).data,
+            )
+            for pr in requests
+        ])
+        with deletes_recorded_as(AuditAction.ARCHIVE):
+            PurchaseRequest.objects.filter(pk__in=ids).delete()
+        return len(ids)
+
+
+def archived_payload(archived, request=None):
+    """Snapshot as the live serializer would render it (absolute file URLs when a request is given)."""
+    data = dict(archived.data)
+    if request is not None:
+        for field in FILE_FIELDS:
+            if data.get(field):
+                data[field] = request.build_absolute_uri(data[field])
+    return data
@@ -0,0 +1,141 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from django.db import connection, transaction
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+
+from apps.purchases.constants import AuditAction
+from apps.purchases.models import AuditEvent
+
+
+IGNORED_FIELDS = {"search_vector", "updated_at"}
+
+_current_request = ContextVar("audit_current_request", default=None)
+_delete_action = ContextVar("audit_delete_action", default=AuditAction.DELETE)
+
+
+
+# ----------------- CONTEXT -----------------
+class AuditContextMiddleware:
+    """Remembers the current request so events can name their actor (DRF sets request.user on it)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+
+def current_actor_id():
+    request = _current_request.get()
+    user = getattr(request, "user", None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+@contextmanager
+def deletes_recorded_as(action):
+    token = _delete_action.set(action)
+    try:
+        yield
+    finally:
+        _delete_action.reset(token)
+
+
+
+# ----------------- DIFFS -----------------
+def saved_values(instance, update_fields=None):
+    fields = instance._meta.concrete_fields
+    if update_fields is not None:
+        fields = [instance._meta.get_field(name) for name in update_fields]
+
+    values = {}
+    for field in fields:
+        if field.attname in IGNORED_FIELDS:
+            continue
+        value = getattr(instance, field.attname)
+        values[field.attname] = value.name if isinstance(value, FieldFile) else value
+    return values
+
+
+def diff(loaded, current):
+    return {k: [loaded[k], v] for k, v in current.items() if k in loaded and loaded[k] != v}
+
+
+
+# ----------------- WRITES -----------------
+def record(instance, action, changes, request_id):
+    # inside the change's own transaction: the event commits, or rolls back (savepoints included), with it
+    AuditEvent.objects.create(
+        purchase_request_id=request_id,
+        model=instance._meta.model_name,
+        object_id=instance.pk,
+        action=action,
+        changes=changes,
+        actor_id=current_actor_id(),
+        created_at=timezone.now(),
+    )
+
+
+def record_saved(instance, created, request_id, update_fields=None):
+    current = saved_values(instance, update_fields)
+    loaded = getattr(instance, "_loaded_values", {})
+
+    if created:
+        record(instance, AuditAction.CREATE, {k: v for k, v in current.items() if v not in (None, "")}, request_id)
+    else:
+        changes = diff(loaded, current)
+        if changes:
+            record(instance, AuditAction.UPDATE, changes, request_id)
+
+    # the saved values are what the row now holds
+    instance._loaded_values = {**loaded, **current}
+
+
+def record_deleted(instance, request_id):
+    record(instance, _delete_action.get(), {}, request_id)
+
+
+
+# ----------------- PARTITIONS -----------------
+def month_start(year, month):
+    return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1, tzinfo=timezone.get_current_timezone())
+
+
+def ensure_partitions(months_ahead=2):
+    """
+    Create monthly partitions of purchases_auditevent from the current month
+    up to `months_ahead`. Rows already written to the DEFAULT partition for a
+    missing month are moved into its new partition (Postgres refuses to
+    create a partition whose range DEFAULT still holds rows).
+    """
+    if connection.vendor != "postgresql":
+        return
+
+    today = timezone.localdate()
+    for offset in range(months_ahead + 1):
+        start = month_start(today.year, today.month + offset)
+        end = month_start(today.year, today.month + offset + 1)
+        create_partition(f"purchases_auditevent_{start:%Y%m}", start, end)
+
+
+def create_partition(name, start, end):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return
+        cursor.execute(
+            "CREATE TEMPORARY TABLE audit_partition_rows ON COMMIT DROP AS "
+            "WITH moved AS (DELETE FROM purchases_auditevent_default WHERE created_at >= %s AND created_at < %s RETURNING *) "
+            "SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"CREATE TABLE {name} PARTITION OF purchases_auditevent FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+        cursor.execute("INSERT INTO purchases_auditevent SELECT * FROM audit_partition_rows")
@@ -0,0 +1,11 @@
+from apps.purchases import outbox
+from apps.purchases.documents import generate_purchase_orders
+
+
+# Outbox handlers: run by `manage.py run_outbox_worker`, never on the request thread
+
+
+@outbox.handler("purchase_request.approved")
+def generate_purchase_order(payload):
+    # Keeps a purchase order finance already uploaded by hand
+    generate_purchase_orders(ids=[payload["id"]], missing_only=True)
@@ -1,41 +1,183 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from apps.purchases.models import PurchaseRequest, ApprovalStep
+from django.contrib.auth import get_user_model
+from apps.purchases.models import ApprovalPolicy, PurchaseRequest, RequestItem, ApprovalStep, FinanceNote
 from apps.purchases.constants import PurchaseStatus, ApprovalStatus
+from apps.purchases.events import announce_status_change
+from apps.purchases import audit, policies, routing
+from apps.purchases.search import schedule_search_refresh
+from apps.purchases.readers import request_payloads
 
 
 def recompute_request_status(request: PurchaseRequest):
+    previous_status = request.status
     steps = request.approval_steps.all()
 
     # If no approvals exist → pending
     if not steps.exists():
         request.status = PurchaseStatus.PENDING
-        request.save(update_fields=["status"])
-        return
 
     # If ANY rejected → rejected
-    if steps.filter(status=ApprovalStatus.REJECTED).exists():
+    elif steps.filter(status=ApprovalStatus.REJECTED).exists():
         request.status = PurchaseStatus.REJECTED
-        request.save(update_fields=["status"])
-        return
-
-    # Count approved
-    approved_count = steps.filter(status=ApprovalStatus.APPROVED).count()
 
     # If completed → approved
-    if approved_count >= request.required_approval_levels:
+    elif steps.filter(status=ApprovalStatus.APPROVED).count() >= request.required_approval_levels:
         request.status = PurchaseStatus.APPROVED
+
     else:
         request.status = PurchaseStatus.PENDING
 
     request.save(update_fields=["status"])
 
+    if request.status != previous_status:
+        announce_status_change(request, previous_status)
+
+    routing.advance(request)
+
 
 @receiver(post_save, sender=ApprovalStep)
 def update_request_on_save(sender, instance, **kwargs):
     recompute_request_status(instance.purchase_request)
 
 
+def deleted_with_request(origin):
+    # post_delete fired by the cascade of deleting (or archiving) the request itself
+    return isinstance(origin, PurchaseRequest) or getattr(origin, "model", None) is PurchaseRequest
+
+
 @receiver(post_delete, sender=ApprovalStep)
-def update_request_on_delete(sender, instance, **kwargs):
+def update_request_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with_request(origin):
+        return
     recompute_request_status(instance.purchase_request)
+
+
+@receiver(post_save, sender=PurchaseRequest)
+def route_new_request(sender, instance, created, **kwargs):
+    if created:
+        routing.advance(instance)
+
+
+# ----------------- POLICY RE-APPLICATION -----------------
+POLICY_FIELDS = {"min_amount", "max_amount", "required_approval_levels", "active", "department", "category"}
+
+
+@receiver(post_save, sender=ApprovalPolicy)
+@receiver(post_delete, sender=ApprovalPolicy)
+def invalidate_policy_index(sender, **kwargs):
+    # after commit, so no process rebuilds its index from the pre-change rows
+    transaction.on_commit(policies.invalidate_policy_index)
+
+
+@receiver(post_save, sender=ApprovalPolicy)
+def reapply_on_policy_save(sender, instance, created, **kwargs):
+    loaded = getattr(instance, "_loaded_values", {})
+    if created:
+        affects_levels = instance.active
+    else:
+        affects_levels = any(loaded.get(f) != getattr(instance, f) for f in POLICY_FIELDS)
+    instance._loaded_values = {**loaded, **{f: getattr(instance, f) for f in POLICY_FIELDS}}
+
+    if affects_levels:
+        policies.schedule_reapplication(f"Policy #{instance.pk} {'created' if created else 'updated'}")
+
+
+@receiver(post_delete, sender=ApprovalPolicy)
+def reapply_on_policy_delete(sender, instance, **kwargs):
+    if instance.active:
+        policies.schedule_reapplication(f"Policy #{instance.pk} deleted")
+
+
+# ----------------- SEARCH VECTOR -----------------
+SEARCHABLE_REQUEST_FIELDS = {"title", "description"}
+SEARCHABLE_USER_FIELDS = {"first_name", "last_name"}  # rendered into search vectors and request payloads
+
+
+@receiver(post_save, sender=PurchaseRequest)
+def refresh_search_on_request_save(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or SEARCHABLE_REQUEST_FIELDS & set(update_fields):
+        schedule_search_refresh(instance.pk)
+
+
+@receiver(post_save, sender=RequestItem)
+@receiver(post_delete, sender=RequestItem)
+def refresh_search_on_item_change(sender, instance, origin=None, **kwargs):
+    if deleted_with_request(origin):
+        return
+    schedule_search_refresh(instance.purchase_request_id)
+
+
+@receiver(pre_save, sender=get_user_model())
+def detect_user_rename(sender, instance, update_fields=None, **kwargs):
+    """Sets instance._renamed; profile edits, logins and password changes don't touch requests."""
+    instance._renamed = False
+    if instance.pk is None or (update_fields is not None and not SEARCHABLE_USER_FIELDS & set(update_fields)):
+        return
+    stored = sender._base_manager.filter(pk=instance.pk).values(*SEARCHABLE_USER_FIELDS).first()
+    instance._renamed = stored is not None and any(stored[name] != getattr(instance, name) for name in SEARCHABLE_USER_FIELDS)
+
+
+@receiver(post_save, sender=get_user_model())
+def refresh_search_on_user_rename(sender, instance, created, **kwargs):
+    if not getattr(instance, "_renamed", False):
+        return
+    for request_id in PurchaseRequest.objects.filter(created_by=instance).values_list("pk", flat=True):
+        schedule_search_refresh(request_id)  # one UPDATE at commit, like request saves
+
+
+# ----------------- AUDIT LOG -----------------
+def audited_request_id(instance):
+    return instance.pk if isinstance(instance, PurchaseRequest) else instance.purchase_request_id
+
+
+@receiver(post_save, sender=PurchaseRequest)
+@receiver(post_save, sender=RequestItem)
+@receiver(post_save, sender=ApprovalStep)
+@receiver(post_save, sender=FinanceNote)
+def audit_on_save(sender, instance, created, update_fields=None, **kwargs):
+    audit.record_saved(instance, created, audited_request_id(instance), update_fields)
+
+
+@receiver(post_delete, sender=PurchaseRequest)
+@receiver(post_delete, sender=RequestItem)
+@receiver(post_delete, sender=ApprovalStep)
+@receiver(post_delete, sender=FinanceNote)
+def audit_on_delete(sender, instance, origin=None, **kwargs):
+    # Children removed by the request's own cascade are implied by its event
+    if sender is not PurchaseRequest and deleted_with_request(origin):
+        return
+    audit.record_deleted(instance, audited_request_id(instance))
+
+
+# ----------------- PAYLOAD CACHE -----------------
+# A request's own writes bump its version, which is part of the payload key;
+# children and user names are rendered into it without doing so.
+@receiver(post_save, sender=RequestItem)
+@receiver(post_save, sender=ApprovalStep)
+@receiver(post_save, sender=FinanceNote)
+@receiver(post_delete, sender=RequestItem)
+@receiver(post_delete, sender=ApprovalStep)
+@receiver(post_delete, sender=FinanceNote)
+def invalidate_request_payload(sender, instance, origin=None, **kwargs):
+    if deleted_with_request(origin):
+        return
+    request_id = instance.purchase_request_id
+    transaction.on_commit(lambda: request_payloads.invalidate(scope=request_id))
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_payloads_on_user_rename(sender, instance, created, **kwargs):
+    if not getattr(instance, "_renamed", False):  # see detect_user_rename
+        return
+    # the requests that render the name: as creator, approver or finance user
+    request_ids = set(PurchaseRequest.objects.filter(created_by=instance).values_list("pk", flat=True))
+    request_ids.update(ApprovalStep.objects.filter(approver=instance).values_list("purchase_request_id", flat=True))
+    request_ids.update(FinanceNote.objects.filter(finance_user=instance).values_list("purchase_request_id", flat=True))
+
+    def invalidate():
+        for request_id in request_ids:
+            request_payloads.invalidate(scope=request_id)
+
+    transaction.on_commit(invalidate)
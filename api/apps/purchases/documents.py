@@ -0,0 +1,129 @@
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Prefetch, Q
+from django.utils import timezone
+
+from apps.purchases import audit
+from apps.purchases.constants import PurchaseStatus, ApprovalStatus, AuditAction
+from apps.purchases.models import PurchaseRequest, ApprovalStep
+from apps.purchases.po_render import render_purchase_order
+
+
+
+def purchase_order_data(purchase_request):
+    """Plain-dict snapshot of a request, picklable for the render pool."""
+    return {
+        "id": purchase_request.pk,
+        "version": purchase_request.version,  # the state rendered; save_purchase_order skips changed requests
+        "number": f"PO-{purchase_request.pk:06d}",
+        "date": timezone.localdate().isoformat(),
+        "title": purchase_request.title,
+        "description": purchase_request.description,
+        "requested_by": purchase_request.created_by.get_full_name(),
+        "amount": str(purchase_request.amount),
+        "items": [
+            {"name": item.item_name, "qty": item.qty, "price": str(item.price), "total": str(item.total_price)}
+            for item in purchase_request.items.all()
+        ],
+        "approvals": [
+            {
+                "level": step.level,
+                "approver": step.approver.get_full_name(),
+                "date": timezone.localtime(step.created_at).date().isoformat(),
+            }
+            for step in purchase_request.approval_steps.all()
+        ],
+    }
+
+
+def approved_requests(ids=None, missing_only=True):
+    queryset = (
+        PurchaseRequest.objects.filter(status=PurchaseStatus.APPROVED)
+        .select_related("created_by")
+        .prefetch_related(
+            "items",
+            Prefetch(
+                "approval_steps",
+                queryset=ApprovalStep.objects.filter(status=ApprovalStatus.APPROVED).select_related("approver").order_by("level"),
+            ),
+        )
+        .order_by("pk")
+    )
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    if missing_only:
+        queryset = queryset.filter(Q(purchase_order="") | Q(purchase_order__isnull=True))
+    return queryset
+
+
+def save_purchase_order(request_id, pdf, version, missing_only=True):
+    """
+    Store the document, unless the request changed since `version` was
+    rendered (or, with `missing_only`, got a purchase order meanwhile).
+    Returns the stored name, or None when skipped.
+    """
+    # Write only the column: no model clean/signals, no clobbering concurrent edits
+    field = PurchaseRequest._meta.get_field("purchase_order")
+    # under a name of its own, so nothing is lost if the update below doesn't happen
+    name = field.storage.save(field.generate_filename(None, f"PO-{request_id:06d}.pdf"), ContentFile(pdf))
+    try:
+        with transaction.atomic():
+            current = PurchaseRequest.objects.select_for_update().filter(pk=request_id, version=version)
+            if missing_only:
+                current = current.filter(Q(purchase_order="") | Q(purchase_order__isnull=True))
+            row = current.values_list("purchase_order").first()
+            if row is not None:
+                previous = row[0]
+                current.update(purchase_order=name, version=F("version") + 1)
+                audit.record(PurchaseRequest(pk=request_id), AuditAction.UPDATE, {"purchase_order": [previous, name]}, request_id)
+                if previous:
+                    transaction.on_commit(lambda: field.storage.delete(previous))
+    except Exception:
+        field.storage.delete(name)
+        raise
+
+    if row is None:
+        field.storage.delete(name)
+        return None
+    return name
+
+
+def generate_purchase_orders(ids=None, missing_only=True, workers=None, batch_size=200):
+    """
+    Render and store purchase orders for approved requests. A single
+    document is rendered inline; batches go through a process pool.
+    Returns (documents generated, elapsed seconds).
+    """
+    started = time.perf_counter()
+    generated = 0
+    queryset = approved_requests(ids=ids, missing_only=missing_only)
+
+    if ids is not None and len(ids) == 1:
+        for purchase_request in queryset:
+            pdf = render_purchase_order(purchase_order_data(purchase_request))
+            generated += save_purchase_order(purchase_request.pk, pdf, purchase_request.version, missing_only) is not None
+        return generated, time.perf_counter() - started
+
+    # spawn: children import only po_render and never share the parent's DB socket
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        batch = []
+        for purchase_request in queryset.iterator(chunk_size=batch_size):
+            batch.append(purchase_order_data(purchase_request))
+            if len(batch) >= batch_size:
+                generated += render_batch(pool, batch, missing_only)
+                batch = []
+        if batch:
+            generated += render_batch(pool, batch, missing_only)
+
+    return generated, time.perf_counter() - started
+
+
+def render_batch(pool, batch, missing_only):
+    """Documents stored; requests changed while rendering are skipped."""
+    saved = 0
+    for data, pdf in zip(batch, pool.map(render_purchase_order, batch, chunksize=8)):
+        saved += save_purchase_order(data["id"], pdf, data["version"], missing_only) is not None
+    return saved
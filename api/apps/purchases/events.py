@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import time
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from django.db import connection, connections
+
+from apps.usr.constants import UserRole
+from apps.purchases import outbox
+from apps.purchases.constants import PurchaseStatus
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHANNEL = "purchase_request_status"
+LISTEN_RETRY_MAX_SECONDS = 60
+
+
+
+# ----------------- PUBLISHING (request thread) -----------------
+def notify_status_change(purchase_request, previous_status):
+    """NOTIFY listeners; Postgres delivers it when the surrounding transaction commits."""
+    if connection.vendor != "postgresql":
+        return
+
+    payload = json.dumps({
+        "id": purchase_request.pk,
+        "status": purchase_request.status,
+        "previous_status": previous_status,
+        "created_by": purchase_request.created_by_id,
+    })
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [STATUS_CHANNEL, payload])
+
+
+def announce_status_change(purchase_request, previous_status):
+    notify_status_change(purchase_request, previous_status)
+    # Side effects run in the outbox worker, committed together with the status change
+    outbox.publish(f"purchase_request.{purchase_request.status.lower()}", {
+        "id": purchase_request.pk,
+        "status": purchase_request.status,
+        "previous_status": previous_status,
+    })
+
+
+
+def is_visible_to(user, event):
+    """Same scoping as PurchaseRequestViewSet.get_queryset, applied to an event payload."""
+    role = getattr(user, "role", None)
+
+    if role == UserRole.STAFF:
+        return event["created_by"] == user.pk
+    elif role == UserRole.APPROVER:
+        return True
+    elif role == UserRole.FINANCE:
+        return event["status"] in [PurchaseStatus.APPROVED, PurchaseStatus.REJECTED]
+    return False
+
+
+
+# ----------------- LISTENING (ASGI event loop) -----------------
+class ListenerUnavailable(Exception):
+    pass
+
+
+class StatusEventBroker:
+    """
+    One LISTEN connection per process, fanned out to an asyncio.Queue per
+    connected client. The socket is watched with loop.add_reader, so idle
+    subscribers cost nothing but their queue. Connecting runs in a thread,
+    so a slow or unreachable database never stalls the open streams;
+    failed attempts back off exponentially.
+    """
+    queue_size = 100
+
+    def __init__(self):
+        self.subscribers = set()
+        self.conn = None
+        self.loop = None
+        self.connecting = None  # (loop, lock) serializing connection attempts on that loop
+        self.failures = 0
+        self.retry_at = 0.0
+
+    async def subscribe(self):
+        """A queue of status events. Raises ListenerUnavailable while the database can't be reached."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        try:
+            await self.ensure_listening()
+        except ListenerUnavailable:
+            self.unsubscribe(queue)
+            raise
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers:
+            self.stop()
+
+    async def ensure_listening(self):
+        loop = asyncio.get_running_loop()
+        if self.connecting is None or self.connecting[0] is not loop:
+            self.connecting = (loop, asyncio.Lock())
+
+        async with self.connecting[1]:
+            if self.conn is not None and self.loop is loop:
+                return
+            if time.monotonic() < self.retry_at:
+                raise ListenerUnavailable("Status listener is backing off")
+            self.stop()
+
+            try:
+                conn = await loop.run_in_executor(None, self.connect)
+            except psycopg2.Error as e:
+                self.failures += 1
+                self.retry_at = time.monotonic() + min(LISTEN_RETRY_MAX_SECONDS, 2 ** self.failures)
+                logger.exception("Status listener could not connect")
+                raise ListenerUnavailable(str(e)) from e
+
+            self.failures = 0
+            if not self.subscribers:  # every client left while connecting
+                conn.close()
+                return
+            self.conn, self.loop = conn, loop
+            loop.add_reader(conn.fileno(), self.on_readable)
+
+    def connect(self):
+        params = connections["default"].get_connection_params()
+        conn = psycopg2.connect(**params)
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{STATUS_CHANNEL}"')
+        return conn
+
+    def on_readable(self):
+        try:
+            self.conn.poll()
+        except psycopg2.Error:
+            logger.exception("Status listener connection lost")
+            self.stop(close_subscribers=True)
+            return
+
+        while self.conn.notifies:
+            notify = self.conn.notifies.pop(0)
+            try:
+                event = json.loads(notify.payload)
+            except ValueError:
+                continue
+            self.publish(event)
+
+    def publish(self, event):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow client: end its stream, EventSource reconnects and refetches.
+                self.subscribers.discard(queue)
+                self.close(queue)
+
+    def stop(self, close_subscribers=False):
+        if self.conn is not None:
+            try:
+                self.loop.remove_reader(self.conn.fileno())
+            except (ValueError, OSError, RuntimeError, psycopg2.Error):
+                pass
+            self.conn.close()
+        self.conn = None
+        self.loop = None
+
+        if close_subscribers:
+            for queue in list(self.subscribers):
+                self.close(queue)
+            self.subscribers.clear()
+
+    @staticmethod
+    def close(queue):
+        """Drop the pending events and leave only the close sentinel, so the stream ends at its next read."""
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+broker = StatusEventBroker()
@@ -0,0 +1,158 @@
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from apps.purchases.constants import PurchaseStatus
+from apps.purchases.models import ApprovalStep, HAS_RECEIPT
+
+
+
+# ----------------- PARSERS -----------------
+def parse_statuses(value):
+    statuses = [v.strip().upper() for v in value.split(",") if v.strip()]
+    invalid = [v for v in statuses if v not in PurchaseStatus.values]
+    if not statuses or invalid:
+        raise ValueError(f"expected one or more of {', '.join(PurchaseStatus.values)}")
+    return statuses
+
+
+def parse_id(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("expected an integer id")
+
+
+def parse_decimal(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError("expected a number")
+
+
+def parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError("expected an ISO date or datetime")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_bool(value):
+    if value.lower() in ("true", "1", "yes"):
+        return True
+    if value.lower() in ("false", "0", "no"):
+        return False
+    raise ValueError("expected true or false")
+
+
+
+class PurchaseRequestFilter:
+    """
+    Query-param filtering and ordering for the requests list.
+
+    Equality filters pick an index prefix, at most one column may be
+    range-filtered, and ordering must be on that same column; every
+    accepted combination is served by one of INDEX_PLANS (mirroring
+    PurchaseRequest.Meta.indexes). Anything else is a 400, not a seq scan.
+    """
+
+    # param: (kind, column, parser)
+    FILTERS = {
+        "status": ("eq", "status", parse_statuses),
+        "created_by": ("eq", "created_by", parse_id),
+        "has_receipt": ("eq", "has_receipt", parse_bool),
+        "approver": ("exists", None, parse_id),
+        "amount_min": ("range", "amount", parse_decimal),
+        "amount_max": ("range", "amount", parse_decimal),
+        "created_after": ("range", "created_at", parse_moment),
+        "created_before": ("range", "created_at", parse_moment),
+    }
+    ORDERING = {"created_at", "amount"}
+    DEFAULT_ORDERING = "-created_at"
+
+    # (equality prefix, range/order column) per index
+    INDEX_PLANS = [
+        ((), "created_at"),
+        ((), "amount"),
+        (("status",), "created_at"),
+        (("status",), "amount"),
+        (("created_by",), "created_at"),
+        (("has_receipt",), "created_at"),
+    ]
+
+    def __init__(self, params, scoped_fields=()):
+        # scoped_fields: equality filters the role scoping already applies (e.g. created_by for staff)
+        self.params = params
+        self.scoped_fields = set(scoped_fields)
+
+    def parse(self):
+        values, errors = {}, {}
+        for param, (kind, column, parser) in self.FILTERS.items():
+            raw = self.params.get(param)
+            if raw in (None, ""):
+                continue
+            try:
+                values[param] = parser(raw)
+            except ValueError as e:
+                errors[param] = str(e)
+        if errors:
+            raise ValidationError(errors)
+        return values
+
+    def resolve_ordering(self, range_columns):
+        ordering = self.params.get("ordering")
+        if not ordering:
+            # a range filter orders by its own column so the same index serves both
+            return f"-{next(iter(range_columns))}" if range_columns else self.DEFAULT_ORDERING
+        if ordering.lstrip("-") not in self.ORDERING:
+            raise ValidationError({"ordering": f"expected one of {', '.join(sorted(self.ORDERING))} (prefix '-' for descending)"})
+        return ordering
+
+    def validate_plan(self, values, ordering):
+        equality = {self.FILTERS[p][1] for p in values if self.FILTERS[p][0] == "eq"} | self.scoped_fields
+        range_columns = {self.FILTERS[p][1] for p in values if self.FILTERS[p][0] == "range"}
+        column = ordering.lstrip("-")
+
+        if len(range_columns) > 1:
+            raise ValidationError({"filters": "Combine amount and date ranges in separate queries; only one range is index-backed."})
+        if range_columns and range_columns != {column}:
+            raise ValidationError({
+                "ordering": f"Range filters on {', '.join(sorted(range_columns))} require ordering by that same column."
+            })
+        if not any(set(prefix) <= equality and plan_column == column for prefix, plan_column in self.INDEX_PLANS):
+            raise ValidationError({"filters": "This filter and ordering combination is not supported by an index."})
+
+    def filter_queryset(self, queryset):
+        values = self.parse()
+        range_columns = {self.FILTERS[p][1] for p in values if self.FILTERS[p][0] == "range"}
+        ordering = self.resolve_ordering(range_columns)
+        self.validate_plan(values, ordering)
+
+        if "status" in values:
+            queryset = queryset.filter(status__in=values["status"])
+        if "created_by" in values:
+            queryset = queryset.filter(created_by_id=values["created_by"])
+        if "has_receipt" in values:
+            queryset = queryset.filter(HAS_RECEIPT if values["has_receipt"] else ~HAS_RECEIPT)
+        if "approver" in values:
+            queryset = queryset.filter(Exists(
+                ApprovalStep.objects.filter(purchase_request=OuterRef("pk"), approver_id=values["approver"])
+            ))
+        if "amount_min" in values:
+            queryset = queryset.filter(amount__gte=values["amount_min"])
+        if "amount_max" in values:
+            queryset = queryset.filter(amount__lte=values["amount_max"])
+        if "created_after" in values:
+            queryset = queryset.filter(created_at__gte=values["created_after"])
+        if "created_before" in values:
+            queryset = queryset.filter(created_at__lt=values["created_before"])
+
+        return queryset.order_by(ordering, "-pk" if ordering.startswith("-") else "pk")
@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.purchases.archive import archive_batch, archivable_requests
+
+
+
+def start_of_month(months_ago):
+    now = timezone.localtime()
+    index = now.year * 12 + now.month - 1 - months_ago
+    return now.replace(year=index // 12, month=index % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+
+class Command(BaseCommand):
+    help = "Move APPROVED/REJECTED requests older than N months into the archive table, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=12, help="Archive requests created before the start of the month N months ago.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["months"] < 1:
+            raise CommandError("--months must be at least 1.")
+
+        before = start_of_month(options["months"])
+        if options["dry_run"]:
+            count = archivable_requests(before).count()
+            self.stdout.write(f"{count} requests created before {before:%Y-%m-%d} would be archived.")
+            return
+
+        total = 0
+        while True:
+            archived = archive_batch(before, batch_size=options["batch_size"])
+            if not archived:
+                break
+            total += archived
+            self.stdout.write(f"Archived {total} requests...")
+            time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} requests created before {before:%Y-%m-%d}."))
@@ -0,0 +1,66 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.core.renderers import ORJSONRenderer
+from apps.purchases.models import PurchaseRequest
+from apps.purchases.readers import ValuesReader, narrow
+from apps.purchases.serializers import PurchaseRequestSerializer
+
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare list payload build time (PurchaseRequestSerializer vs the ValuesReader fast path, with a "
+        "byte-parity check) and JSON render time (stdlib JSONRenderer vs ORJSONRenderer)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 1000])
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        renderers = [("json", JSONRenderer()), ("orjson", ORJSONRenderer())]
+        # a request in the context, so file fields render absolute URLs as they do in the API
+        context = {"request": Request(APIRequestFactory().get("/api/purchases/requests/"))}
+        failures = 0
+
+        for size in options["sizes"]:
+            queryset = PurchaseRequest.objects.order_by("-created_at", "-pk")[:size]
+            if not queryset.exists():
+                raise CommandError("No purchase requests to render.")
+
+            # loaded the way retrieve loads a request, children ordered as the reader orders them
+            started = time.perf_counter()
+            page = list(narrow(PurchaseRequest.objects.order_by("-created_at", "-pk"), PurchaseRequestSerializer)[:size])
+            data = PurchaseRequestSerializer(page, many=True, context=context).data
+            serialize_ms = (time.perf_counter() - started) * 1000
+
+            reader = ValuesReader.for_serializer(PurchaseRequestSerializer, context)
+            started = time.perf_counter()
+            fast = reader.represent(reader.values(queryset))
+            reader_ms = (time.perf_counter() - started) * 1000
+
+            parity = ORJSONRenderer().render(fast) == ORJSONRenderer().render(data)
+            failures += not parity
+
+            outputs = {}
+            timings = {}
+            for label, renderer in renderers:
+                started = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    outputs[label] = renderer.render(data)
+                timings[label] = (time.perf_counter() - started) / options["repeat"] * 1000
+
+            identical = "identical" if outputs["json"] == outputs["orjson"] else "DIFFERENT"
+            self.stdout.write(
+                f"page {len(page):>5}  serializer {serialize_ms:8.2f} ms  reader {reader_ms:8.2f} ms  "
+                f"x{serialize_ms / reader_ms:5.1f}  {'parity' if parity else 'MISMATCH'}  |  "
+                f"json {timings['json']:7.2f} ms  orjson {timings['orjson']:7.2f} ms  "
+                f"x{timings['json'] / timings['orjson']:5.1f}  {len(outputs['orjson']):>9} bytes  {identical}"
+            )
+
+        if failures:
+            raise CommandError(f"ValuesReader output differs from PurchaseRequestSerializer on {failures} page size(s).")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.purchases.audit import ensure_partitions
+
+
+
+class Command(BaseCommand):
+    help = "Create the monthly audit log partitions for the current and upcoming months."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=2)
+
+    def handle(self, *args, **options):
+        ensure_partitions(months_ahead=options["months_ahead"])
+        self.stdout.write(self.style.SUCCESS("Audit partitions are in place."))
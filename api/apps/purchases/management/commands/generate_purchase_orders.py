@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.purchases.documents import generate_purchase_orders
+
+
+
+class Command(BaseCommand):
+    help = "Generate purchase order PDFs for approved requests (backfill / regeneration)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", type=int, nargs="+", help="Only these purchase request ids.")
+        parser.add_argument("--regenerate", action="store_true", help="Overwrite existing purchase orders too.")
+        parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count).")
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        generated, elapsed = generate_purchase_orders(
+            ids=options["ids"],
+            missing_only=not options["regenerate"],
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+        )
+        rate = generated / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {generated} purchase orders in {elapsed:.2f}s ({rate:.1f} documents/sec)."
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.purchases.constants import JobStatus
+from apps.purchases.policies import reapply_step, schedule_reapplication
+
+
+
+class Command(BaseCommand):
+    help = "Re-evaluate required approval levels of all PENDING requests against the active policies."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        schedule_reapplication("Manual re-application")
+
+        # runs queued jobs (including one the worker has not picked up yet) to completion
+        while (job := reapply_step(batch_size=options["batch_size"])) is not None:
+            self.stdout.write(f"#{job.pk}: {job.processed}/{job.total} processed, {job.changed} changed, {job.approved} approved")
+            if job.status == JobStatus.DONE:
+                self.stdout.write(self.style.SUCCESS(f"Policy re-application #{job.pk} finished."))
+
+        self.stdout.write(self.style.SUCCESS("No policy re-applications left to run."))
@@ -0,0 +1,70 @@
+import signal
+import time
+import logging
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.core import idempotency
+from apps.purchases import outbox, policies
+from apps.purchases.audit import ensure_partitions
+from apps.usr import tokens
+
+
+logger = logging.getLogger(__name__)
+
+PARTITION_CHECK_SECONDS = 3600
+
+
+
+class Command(BaseCommand):
+    help = (
+        "Drain the transactional outbox, running post-approval side effects outside the web workers, "
+        "and advance policy re-applications one chunk at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--reapply-batch-size", type=int, default=1000, help="Pending requests re-evaluated per chunk after a policy change.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument("--once", action="store_true", help="Drain until empty, then exit.")
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        processed = 0
+        partitions_checked_at = None
+        while self.running:
+            close_old_connections()
+            if partitions_checked_at is None or time.monotonic() - partitions_checked_at > PARTITION_CHECK_SECONDS:
+                self.maintain()
+                partitions_checked_at = time.monotonic()
+
+            count = outbox.drain(batch_size=options["batch_size"])
+            processed += count
+            # interleaved with draining, so a long re-application never holds up side effects
+            reapplying = policies.reapply_step(batch_size=options["reapply_batch_size"]) is not None
+
+            if count == 0 and not reapplying:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"Outbox worker stopped after {processed} events."))
+
+    def maintain(self):
+        tasks = [
+            ensure_partitions,
+            idempotency.purge_expired,  # idempotency keys past their TTL
+            tokens.purge_expired,  # revocations of tokens that expired anyway
+        ]
+        for task in tasks:
+            try:
+                task()
+            except Exception:
+                # retried at the next check; the outbox keeps draining meanwhile
+                logger.exception("Outbox worker maintenance task %s failed", task.__qualname__)
+
+    def stop(self, signum, frame):
+        self.running = False
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:38
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0007_alter_financenote_purchase_request'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=100, verbose_name='Topic')),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Payload')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last Error')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Available At')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processed At')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDING')), fields=['available_at', 'id'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
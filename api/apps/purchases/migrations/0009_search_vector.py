@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# the weights and configs of apps.purchases.search at the time of this migration
+POPULATE_SEARCH_VECTORS = """
+UPDATE {request} AS pr SET search_vector =
+    setweight(to_tsvector('english'::regconfig, COALESCE(pr.title, '')), 'A')
+    || setweight(to_tsvector('english'::regconfig, COALESCE(pr.description, '')), 'B')
+    || setweight(to_tsvector('english'::regconfig, COALESCE(
+        (SELECT string_agg(i.item_name, ' ') FROM {item} AS i WHERE i.purchase_request_id = pr.id), ''
+    )), 'C')
+    || setweight(to_tsvector('simple'::regconfig, COALESCE(
+        (SELECT u.first_name || ' ' || u.last_name FROM {user} AS u WHERE u.id = pr.created_by_id), ''
+    )), 'D')
+"""
+
+
+def populate_search_vectors(apps, schema_editor):
+    schema_editor.execute(POPULATE_SEARCH_VECTORS.format(
+        request=schema_editor.quote_name(apps.get_model('purchases', 'PurchaseRequest')._meta.db_table),
+        item=schema_editor.quote_name(apps.get_model('purchases', 'RequestItem')._meta.db_table),
+        user=schema_editor.quote_name(apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0008_outboxevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='purchase_request_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='purchase_request_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='requestitem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['item_name'], name='request_item_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
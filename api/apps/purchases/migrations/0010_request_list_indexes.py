@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0009_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['created_at'], name='pr_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['amount'], name='pr_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['status', 'created_at'], name='pr_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['status', 'amount'], name='pr_status_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['created_by', 'created_at'], name='pr_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(condition=models.Q(('receipt__isnull', False), models.Q(('receipt', ''), _negated=True)), fields=['created_at'], name='pr_receipt_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(condition=models.Q(('receipt__isnull', False), models.Q(('receipt', ''), _negated=True), _negated=True), fields=['created_at'], name='pr_no_receipt_created_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:42
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0010_request_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPurchaseRequest',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Original Request ID')),
+                ('title', models.CharField(max_length=255, verbose_name='Purchase Title')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Amount')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected')], max_length=20, verbose_name='Request Status')),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Snapshot')),
+                ('created_at', models.DateTimeField(verbose_name='Created At')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archived At')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_purchase_requests', to=settings.AUTH_USER_MODEL, verbose_name='Requested By')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_by', 'created_at'], name='archived_pr_creator_idx'), models.Index(fields=['created_at'], name='archived_pr_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:43
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from datetime import datetime
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+CREATE_PARTITIONED_TABLE = """
+CREATE TABLE purchases_auditevent (
+    id bigserial NOT NULL,
+    purchase_request_id bigint NOT NULL,
+    model varchar(30) NOT NULL,
+    object_id bigint NOT NULL,
+    action varchar(10) NOT NULL,
+    changes jsonb NOT NULL,
+    actor_id bigint NULL,
+    created_at timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+CREATE INDEX audit_request_idx ON purchases_auditevent (purchase_request_id, id);
+CREATE INDEX audit_actor_idx ON purchases_auditevent (actor_id);
+CREATE TABLE purchases_auditevent_default PARTITION OF purchases_auditevent DEFAULT;
+"""
+
+
+def create_monthly_partitions(apps, schema_editor):
+    # current month and the two after it; later ones come from the outbox worker (apps.purchases.audit)
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    today = timezone.localdate()
+    with schema_editor.connection.cursor() as cursor:
+        for offset in range(3):
+            index = today.year * 12 + today.month - 1 + offset
+            start = datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.get_current_timezone())
+            index += 1
+            end = datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.get_current_timezone())
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS purchases_auditevent_{start:%Y%m} "
+                "PARTITION OF purchases_auditevent FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0011_archivedpurchaserequest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='AuditEvent',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('purchase_request_id', models.BigIntegerField(verbose_name='Purchase Request ID')),
+                        ('model', models.CharField(max_length=30, verbose_name='Model')),
+                        ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                        ('action', models.CharField(choices=[('CREATE', 'Create'), ('UPDATE', 'Update'), ('DELETE', 'Delete'), ('ARCHIVE', 'Archive')], max_length=10, verbose_name='Action')),
+                        ('changes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Changes')),
+                        ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created At')),
+                        ('actor', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Actor')),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['purchase_request_id', 'id'], name='audit_request_idx')],
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(CREATE_PARTITIONED_TABLE, "DROP TABLE purchases_auditevent CASCADE;"),
+            ],
+        ),
+        migrations.RunPython(create_monthly_partitions, migrations.RunPython.noop),
+    ]
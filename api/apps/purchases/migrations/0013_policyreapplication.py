@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0012_auditevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PolicyReapplication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(max_length=255, verbose_name='Reason')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=20, verbose_name='Status')),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Pending Requests')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Processed')),
+                ('changed', models.PositiveIntegerField(default=0, verbose_name='Levels Changed')),
+                ('approved', models.PositiveIntegerField(default=0, verbose_name='Approved')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Last Processed Request ID')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:50
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def resolve_overlaps(apps, schema_editor):
+    """
+    Make existing active ranges disjoint without changing which policy any
+    amount resolves to: apply_policy took the first match by min_amount, so
+    later overlapping policies lose the overlapped part (or are deactivated
+    when fully shadowed).
+    """
+    ApprovalPolicy = apps.get_model("purchases", "ApprovalPolicy")
+    covered_to = None
+    for policy in ApprovalPolicy.objects.filter(active=True).order_by("min_amount", "pk"):
+        if covered_to is not None and policy.max_amount <= covered_to:
+            ApprovalPolicy.objects.filter(pk=policy.pk).update(active=False)
+            continue
+        if covered_to is not None and policy.min_amount <= covered_to:
+            ApprovalPolicy.objects.filter(pk=policy.pk).update(min_amount=covered_to + Decimal("0.01"))
+        covered_to = policy.max_amount
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0013_policyreapplication'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='approvalpolicy',
+            name='amount_range',
+            field=models.GeneratedField(db_persist=True, expression=models.Func(models.F('min_amount'), models.F('max_amount'), models.Value('[]'), function='numrange'), output_field=django.contrib.postgres.fields.ranges.DecimalRangeField()),
+        ),
+        migrations.RunPython(resolve_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='approvalpolicy',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('active', True)), expressions=[('amount_range', '&&')], name='approval_policy_no_overlap'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:53
+
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0014_approvalpolicy_amount_range'),
+    ]
+
+    operations = [
+        # GiST equality on the text dimensions in the exclusion constraint
+        BtreeGistExtension(),
+        migrations.RemoveConstraint(
+            model_name='approvalpolicy',
+            name='approval_policy_no_overlap',
+        ),
+        migrations.AddField(
+            model_name='approvalpolicy',
+            name='category',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Spend Category'),
+        ),
+        migrations.AddField(
+            model_name='approvalpolicy',
+            name='department',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Department'),
+        ),
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='category',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Spend Category'),
+        ),
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='department',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Department'),
+        ),
+        migrations.AddConstraint(
+            model_name='approvalpolicy',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('active', True)), expressions=[('department', '='), ('category', '='), ('amount_range', '&&')], name='approval_policy_no_overlap'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0015_policy_dimensions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApproverPool',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Pool Name')),
+                ('level', models.PositiveIntegerField(verbose_name='Approval Level')),
+                ('department', models.CharField(blank=True, default='', max_length=100, verbose_name='Department')),
+                ('active', models.BooleanField(default=True, verbose_name='Active Pool')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('members', models.ManyToManyField(limit_choices_to={'role': 'approver'}, related_name='approver_pools', to=settings.AUTH_USER_MODEL, verbose_name='Approvers')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ApprovalAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveIntegerField(verbose_name='Approval Level')),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], default='OPEN', max_length=20, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True, verbose_name='Closed At')),
+                ('approver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approval_assignments', to=settings.AUTH_USER_MODEL, verbose_name='Approver')),
+                ('purchase_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='purchases.purchaserequest', verbose_name='Purchase Request')),
+                ('pool', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assignments', to='purchases.approverpool', verbose_name='Pool')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='approverpool',
+            constraint=models.UniqueConstraint(condition=models.Q(('active', True)), fields=('level', 'department'), name='approver_pool_unique_scope'),
+        ),
+        migrations.AddIndex(
+            model_name='approvalassignment',
+            index=models.Index(condition=models.Q(('status', 'OPEN')), fields=['approver', 'created_at'], name='assignment_open_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='approvalassignment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'OPEN')), fields=('purchase_request', 'level'), name='assignment_open_level'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:02
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0016_approval_routing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditevent',
+            name='recorded_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False, verbose_name='Recorded At'),
+        ),
+    ]
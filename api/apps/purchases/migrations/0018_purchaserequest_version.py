@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0017_auditevent_recorded_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Version'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0018_purchaserequest_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='auditevent',
+            name='recorded_at',
+        ),
+        migrations.AddField(
+            model_name='auditevent',
+            name='txid',
+            field=models.BigIntegerField(db_default=models.Func(function='txid_current'), editable=False, verbose_name='Transaction ID'),
+        ),
+        migrations.AddIndex(
+            model_name='auditevent',
+            index=models.Index(fields=['txid', 'id'], name='audit_txid_idx'),
+        ),
+    ]
@@ -1,27 +1,141 @@
+import logging
 from decimal import Decimal
 from django.db import models
 from django.db.models import Max
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DecimalRangeField, RangeOperators
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.safestring import mark_safe
 from django.core.validators import FileExtensionValidator
 from django.core.exceptions import ValidationError
-from apps.purchases.constants import PurchaseStatus, ApprovalStatus
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from apps.usr.constants import UserRole
+from apps.purchases.constants import PurchaseStatus, ApprovalStatus, OutboxStatus, AuditAction, JobStatus, AssignmentStatus
 
 
+logger = logging.getLogger(__name__)
 
 
-class ApprovalPolicy(models.Model):
+
+class TrackedModel(models.Model):
+    """Keeps the column values a row was loaded with, so changes can be diffed without a re-fetch."""
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def loaded_values(self, *names):
+        """Stored values of the named columns; only the ones not loaded with the row (deferred, or built by hand) are queried."""
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            loaded = self._loaded_values = {}
+        missing = [name for name in names if name not in loaded]
+        if missing and self.pk is not None:
+            loaded.update(type(self)._base_manager.filter(pk=self.pk).values(*missing).first() or {})
+        return {name: loaded.get(name) for name in names}
+
+
+
+class ConcurrentUpdate(Exception):
+    """The row changed since it was loaded (or since the version the client sent)."""
+
+
+
+class VersionedModel(TrackedModel):
+    """
+    Optimistic locking: every UPDATE bumps the version. A save after
+    expect_version() (the client's If-Match) is `... WHERE version = <it>`,
+    and a lost race raises ConcurrentUpdate instead of overwriting the
+    other write. Other saves (internal bookkeeping, admin, commands) are
+    last-write-wins on top of whatever version the row has by then. Bulk
+    `.update()`s must bump the version themselves.
+    """
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name="Version")
+
+    class Meta:
+        abstract = True
+
+    def expect_version(self, version):
+        """Make the next save fail with ConcurrentUpdate unless the row is still at `version`."""
+        self._client_version = version
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        checked = getattr(self, "_client_version", None)
+        self._client_version = None  # the client's version covers its own write, not the bookkeeping saves after it
+        expected = checked if checked is not None else self.loaded_values("version")["version"]
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        self._expected_version, self._version_checked, self.version = expected, checked is not None, expected + 1
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self.version = expected
+            raise
+        finally:
+            self._expected_version = None
+        self._loaded_values["version"] = self.version
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, "_expected_version", None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        while True:
+            if super()._do_update(base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update):
+                return True
+            current = base_qs.filter(pk=pk_val).values_list("version", flat=True).first()
+            if current is None:
+                return False
+            if self._version_checked:
+                raise ConcurrentUpdate(f"{self._meta.verbose_name} #{pk_val} was changed by someone else.")
+            # unchecked: write on top of the newer version instead
+            expected, self.version = current, current + 1
+            values = [(field, model, self.version if field.attname == "version" else value) for field, model, value in values]
+
+
+
+class ApprovalPolicy(TrackedModel):
     title = models.CharField(max_length=255, verbose_name="Policy Title")
     min_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Minimum Amount", validators=[MinValueValidator(0)])
     max_amount = models.DecimalField(max_digits=12, decimal_places=2, default=999999999, verbose_name="Maximum Amount", validators=[MinValueValidator(0)])
     required_approval_levels = models.PositiveIntegerField(default=2, verbose_name="Approval Levels")
     active = models.BooleanField(default=True, verbose_name="Active Policy")
+    # optional dimensions: blank matches any department / category, the most specific match wins
+    department = models.CharField(max_length=100, blank=True, default="", verbose_name="Department")
+    category = models.CharField(max_length=100, blank=True, default="", verbose_name="Spend Category")
+    # [min_amount, max_amount] as a numrange, computed by Postgres; backs the no-overlap constraint and @> lookups
+    amount_range = models.GeneratedField(
+        expression=models.Func(models.F("min_amount"), models.F("max_amount"), models.Value("[]"), function="numrange"),
+        output_field=DecimalRangeField(),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["min_amount"]
-        
+        constraints = [
+            ExclusionConstraint(
+                name="approval_policy_no_overlap",
+                expressions=[
+                    ("department", RangeOperators.EQUAL),
+                    ("category", RangeOperators.EQUAL),
+                    ("amount_range", RangeOperators.OVERLAPS),
+                ],
+                condition=models.Q(active=True),
+            ),
+        ]
+
     def matches(self, amount):
         if not self.active:
             return False
@@ -31,22 +145,45 @@ class ApprovalPolicy(models.Model):
         return min_amount <= amount <= max_amount
     
     def __str__(self):
-        return f"{self.title} ({self.min_amount} - {self.max_amount} => {self.required_approval_levels} levels)"
+        scope = " / ".join(filter(None, [self.department, self.category]))
+        scope = f" [{scope}]" if scope else ""
+        return f"{self.title}{scope} ({self.min_amount} - {self.max_amount} => {self.required_approval_levels} levels)"
+
 
 
+HAS_RECEIPT = models.Q(receipt__isnull=False) & ~models.Q(receipt="")
 
-class PurchaseRequest(models.Model):
+
+class PurchaseRequest(VersionedModel):
     created_by = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="purchase_requests", verbose_name="Requested By")
     title = models.CharField(max_length=255, verbose_name="Purchase Title")
     description = models.TextField(verbose_name="Description...", blank=True, null=True)
     amount = models.DecimalField(verbose_name="Amount", max_digits=12, decimal_places=2, default=0, editable=False)
     status = models.CharField(verbose_name="Request Status", max_length=20, choices=PurchaseStatus.choices, default=PurchaseStatus.PENDING)
     required_approval_levels = models.PositiveIntegerField(default=2, verbose_name="Required Approval Levels")
+    department = models.CharField(max_length=100, blank=True, default="", verbose_name="Department")
+    category = models.CharField(max_length=100, blank=True, default="", verbose_name="Spend Category")
     proforma_invoice = models.FileField(verbose_name="Proforma Invoice File", upload_to="proforma/", validators=[FileExtensionValidator(['png','jpg','jpeg', 'pdf', 'ppt', 'docx', 'xlsx'])], null=True, blank=True)
     purchase_order = models.FileField(verbose_name="Purchase Order", upload_to="purchase_orders/", validators=[FileExtensionValidator(['png','jpg','jpeg', 'pdf', 'ppt', 'docx', 'xlsx'])], null=True, blank=True)
     receipt = models.FileField(verbose_name="Receipt File", upload_to="receipts/", validators=[FileExtensionValidator(['png','jpg','jpeg', 'pdf', 'ppt', 'docx', 'xlsx'])], null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # title, description, item names and creator name; maintained by apps.purchases.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="purchase_request_search_idx"),
+            GinIndex(fields=["title"], opclasses=["gin_trgm_ops"], name="purchase_request_title_trgm"),
+            # list filters/ordering, see apps.purchases.filters.PurchaseRequestFilter.INDEX_PLANS
+            models.Index(fields=["created_at"], name="pr_created_idx"),
+            models.Index(fields=["amount"], name="pr_amount_idx"),
+            models.Index(fields=["status", "created_at"], name="pr_status_created_idx"),
+            models.Index(fields=["status", "amount"], name="pr_status_amount_idx"),
+            models.Index(fields=["created_by", "created_at"], name="pr_creator_created_idx"),
+            models.Index(fields=["created_at"], condition=HAS_RECEIPT, name="pr_receipt_created_idx"),
+            models.Index(fields=["created_at"], condition=~HAS_RECEIPT, name="pr_no_receipt_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.status}"
@@ -60,33 +197,39 @@ class PurchaseRequest(models.Model):
         if total is None or total == 0:
             return
 
-        for policy in ApprovalPolicy.objects.filter(active=True).order_by("min_amount"):
-            if policy.matches(total):
-                self.required_approval_levels = policy.required_approval_levels
-                print(f"Policy applied: {policy.title} -> {self.required_approval_levels}")
-                return
+        from apps.purchases.policies import resolve_policy  # imports this module
+
+        policy = resolve_policy(self.department, self.category, total)
+        if policy is not None:
+            self.required_approval_levels = policy.required_approval_levels
+            logger.debug("Policy applied: %s -> %s", policy.title, self.required_approval_levels)
 
     def clean(self):
         self.apply_policy()
 
         if self.pk:
-            old = PurchaseRequest.objects.get(pk=self.pk)
-            if old.status == PurchaseStatus.REJECTED:
+            protected = ["title", "description", "amount", "required_approval_levels"]
+            old = self.loaded_values("status", *protected)
+            if old["status"] == PurchaseStatus.REJECTED:
                 raise ValidationError("Rejected requests cannot be changed.")
 
-            if old.status == PurchaseStatus.APPROVED:
-                protected = ["title", "description", "amount", "required_approval_levels"]
+            if old["status"] == PurchaseStatus.APPROVED:
                 for f in protected:
-                    if getattr(old, f) != getattr(self, f):
+                    if old[f] != getattr(self, f):
                         raise ValidationError(f"'{f}' cannot be changed after approval.")
 
 
-class RequestItem(models.Model):
+class RequestItem(TrackedModel):
     purchase_request = models.ForeignKey(PurchaseRequest, on_delete=models.CASCADE, related_name="items", verbose_name="Purchase Request")
     item_name = models.CharField(max_length=255, verbose_name="Item Name")
     qty = models.PositiveIntegerField(default=1, verbose_name="Quantity")
     price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Unit Price")
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=["item_name"], opclasses=["gin_trgm_ops"], name="request_item_name_trgm"),
+        ]
+
     @property
     def total_price(self):
         return self.qty * self.price
@@ -109,7 +252,7 @@ class RequestItem(models.Model):
 
 
 
-class ApprovalStep(models.Model):
+class ApprovalStep(TrackedModel):
     purchase_request = models.ForeignKey(PurchaseRequest, on_delete=models.CASCADE, related_name="approval_steps", verbose_name="Purchase Request")
     approver = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="approved_requests", verbose_name="Approver")
     level = models.PositiveIntegerField(verbose_name="Approvel Level", blank=True, null=True)  # 1, 2, 3…
@@ -125,10 +268,14 @@ class ApprovalStep(models.Model):
         self.amount = total
     
     def clean(self):
+        if self.purchase_request_id and self.approver_id:
+            others = ApprovalStep.objects.filter(purchase_request_id=self.purchase_request_id, approver_id=self.approver_id)
+            if others.exclude(pk=self.pk).exists():
+                raise ValidationError("An approver cannot act on more than one level of the same request.")
+
         if not self.pk:
             return
-        old = ApprovalStep.objects.get(pk=self.pk)
-        if old.status in [ApprovalStatus.APPROVED, ApprovalStatus.REJECTED]:
+        if self.loaded_values("status")["status"] in [ApprovalStatus.APPROVED, ApprovalStatus.REJECTED]:
             raise ValidationError("Final approval cannot be changed.")
         
         # Prevent exceeding required levels
@@ -161,11 +308,138 @@ class ApprovalStep(models.Model):
 
 
 
-class FinanceNote(models.Model):
+# Who may approve a given level (optionally per department); see apps.purchases.routing
+class ApproverPool(models.Model):
+    name = models.CharField(max_length=255, verbose_name="Pool Name")
+    level = models.PositiveIntegerField(verbose_name="Approval Level")
+    department = models.CharField(max_length=100, blank=True, default="", verbose_name="Department")
+    members = models.ManyToManyField(get_user_model(), related_name="approver_pools", limit_choices_to={"role": UserRole.APPROVER}, verbose_name="Approvers")
+    active = models.BooleanField(default=True, verbose_name="Active Pool")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["level", "department"], condition=models.Q(active=True), name="approver_pool_unique_scope"),
+        ]
+
+    def __str__(self):
+        scope = f" [{self.department}]" if self.department else ""
+        return f"{self.name}{scope} - level {self.level}"
+
+
+class ApprovalAssignment(models.Model):
+    purchase_request = models.ForeignKey(PurchaseRequest, on_delete=models.CASCADE, related_name="assignments", verbose_name="Purchase Request")
+    level = models.PositiveIntegerField(verbose_name="Approval Level")
+    approver = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="approval_assignments", verbose_name="Approver")
+    pool = models.ForeignKey(ApproverPool, on_delete=models.SET_NULL, null=True, blank=True, related_name="assignments", verbose_name="Pool")
+    status = models.CharField(max_length=20, choices=AssignmentStatus.choices, default=AssignmentStatus.OPEN, verbose_name="Status")
+    created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True, verbose_name="Closed At")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["purchase_request", "level"], condition=models.Q(status=AssignmentStatus.OPEN), name="assignment_open_level"),
+        ]
+        indexes = [
+            # "assigned to me" and queue depth per approver
+            models.Index(fields=["approver", "created_at"], condition=models.Q(status=AssignmentStatus.OPEN), name="assignment_open_idx"),
+        ]
+
+    def __str__(self):
+        return f"Request #{self.purchase_request_id} level {self.level} -> {self.approver_id} ({self.status})"
+
+
+
+class FinanceNote(TrackedModel):
     purchase_request = models.ForeignKey( PurchaseRequest, on_delete=models.CASCADE, related_name="finance_notes", verbose_name="Purchase Request")
     finance_user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="finance_notes_created", verbose_name="Finance Officer")
     note = models.TextField(verbose_name="Finance Note", blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Finance Note - {self.purchase_request.id}"
+        return f"Finance Note - {self.purchase_request_id}"
+
+
+
+# Finalized requests moved out of the hot tables by `manage.py archive_requests`
+class ArchivedPurchaseRequest(models.Model):
+    id = models.BigIntegerField(primary_key=True, verbose_name="Original Request ID")
+    created_by = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="archived_purchase_requests", verbose_name="Requested By")
+    title = models.CharField(max_length=255, verbose_name="Purchase Title")
+    amount = models.DecimalField(verbose_name="Amount", max_digits=12, decimal_places=2)
+    status = models.CharField(verbose_name="Request Status", max_length=20, choices=PurchaseStatus.choices)
+    # PurchaseRequestSerializer output at archive time, served as-is by retrieve
+    data = models.JSONField(encoder=DjangoJSONEncoder, verbose_name="Snapshot")
+    created_at = models.DateTimeField(verbose_name="Created At")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Archived At")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_by", "created_at"], name="archived_pr_creator_idx"),
+            models.Index(fields=["created_at"], name="archived_pr_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.status} (archived)"
+
+
+
+class OutboxEvent(models.Model):
+    topic = models.CharField(max_length=100, verbose_name="Topic")
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="Payload")
+    status = models.CharField(max_length=20, choices=OutboxStatus.choices, default=OutboxStatus.PENDING, verbose_name="Status")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Attempts")
+    last_error = models.TextField(null=True, blank=True, verbose_name="Last Error")
+    available_at = models.DateTimeField(default=timezone.now, verbose_name="Available At")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Processed At")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["available_at", "id"], condition=models.Q(status=OutboxStatus.PENDING), name="outbox_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk} - {self.status}"
+
+
+
+# Re-evaluation of PENDING requests after a policy change, run in chunks by the outbox worker
+class PolicyReapplication(models.Model):
+    reason = models.CharField(max_length=255, verbose_name="Reason")
+    status = models.CharField(max_length=20, choices=JobStatus.choices, default=JobStatus.PENDING, verbose_name="Status")
+    total = models.PositiveIntegerField(null=True, blank=True, verbose_name="Pending Requests")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Processed")
+    changed = models.PositiveIntegerField(default=0, verbose_name="Levels Changed")
+    approved = models.PositiveIntegerField(default=0, verbose_name="Approved")
+    last_id = models.BigIntegerField(default=0, verbose_name="Last Processed Request ID")
+    error = models.TextField(null=True, blank=True, verbose_name="Error")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Started At")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Finished At")
+
+    def __str__(self):
+        return f"Policy re-application #{self.pk} - {self.status}"
+
+
+
+# Append-only change log; the table is range-partitioned by month (see migration 0012)
+class AuditEvent(models.Model):
+    purchase_request_id = models.BigIntegerField(verbose_name="Purchase Request ID")  # no FK: outlives deletes and archival
+    model = models.CharField(max_length=30, verbose_name="Model")
+    object_id = models.BigIntegerField(verbose_name="Object ID")
+    action = models.CharField(max_length=10, choices=AuditAction.choices, verbose_name="Action")
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="Changes")
+    actor = models.ForeignKey(get_user_model(), on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name="+", verbose_name="Actor")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Created At")
+    # id of the transaction that made the change, set by Postgres; the delta sync cursor (see apps.purchases.sync)
+    txid = models.BigIntegerField(db_default=models.Func(function="txid_current"), editable=False, verbose_name="Transaction ID")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["purchase_request_id", "id"], name="audit_request_idx"),
+            models.Index(fields=["txid", "id"], name="audit_txid_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.model} #{self.object_id}"
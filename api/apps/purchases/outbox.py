@@ -0,0 +1,69 @@
+import logging
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+
+from apps.purchases.constants import OutboxStatus
+from apps.purchases.models import OutboxEvent
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+
+_handlers = defaultdict(list)
+
+
+
+def handler(topic):
+    """Register a function to run (in the outbox worker) for every event on `topic`."""
+    def register(func):
+        _handlers[topic].append(func)
+        return func
+    return register
+
+
+def publish(topic, payload):
+    """Queue an event in the caller's transaction; it is only visible to the worker after commit."""
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(2 ** attempts, 3600))
+
+
+def drain(batch_size=100):
+    """
+    Process one batch of due events. Rows are claimed with
+    SELECT ... FOR UPDATE SKIP LOCKED, so several workers can drain in
+    parallel and a crashed worker simply releases its batch.
+    """
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxStatus.PENDING, available_at__lte=timezone.now())
+            .order_by("available_at", "id")[:batch_size]
+        )
+
+        for event in events:
+            try:
+                with transaction.atomic():
+                    for func in _handlers.get(event.topic, []):
+                        func(event.payload)
+            except Exception:
+                logger.exception("Outbox handler failed for %s", event)
+                event.attempts += 1
+                event.last_error = traceback.format_exc()
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = OutboxStatus.FAILED
+                else:
+                    event.available_at = timezone.now() + retry_delay(event.attempts)
+            else:
+                event.status = OutboxStatus.DONE
+                event.processed_at = timezone.now()
+
+        OutboxEvent.objects.bulk_update(events, ["status", "attempts", "last_error", "available_at", "processed_at"])
+
+    return len(events)
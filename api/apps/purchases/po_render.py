@@ -0,0 +1,91 @@
+"""
+Purchase order rendering with Pillow.
+
+Kept free of Django imports: functions here receive plain dicts (see
+documents.purchase_order_data) so they can run in a process pool.
+"""
+import io
+import textwrap
+from PIL import Image, ImageDraw, ImageFont
+
+
+PAGE_SIZE = (1240, 1754)  # A4 at 150 dpi
+MARGIN = 100
+LINE_HEIGHT = 34
+TITLE_SIZE = 44
+TEXT_SIZE = 22
+
+# x offsets of the item table columns
+COLUMNS = {"item": MARGIN, "qty": 700, "price": 820, "total": 1000}
+
+_fonts = {}
+
+
+def font(size):
+    if size not in _fonts:
+        _fonts[size] = ImageFont.load_default(size=size)
+    return _fonts[size]
+
+
+class Page:
+    def __init__(self):
+        self.image = Image.new("L", PAGE_SIZE, 255)
+        self.draw = ImageDraw.Draw(self.image)
+        self.y = MARGIN
+
+    @property
+    def full(self):
+        return self.y > PAGE_SIZE[1] - MARGIN - LINE_HEIGHT
+
+    def text(self, x, value, size=TEXT_SIZE):
+        self.draw.text((x, self.y), str(value), fill=0, font=font(size))
+
+    def rule(self):
+        self.draw.line((MARGIN, self.y, PAGE_SIZE[0] - MARGIN, self.y), fill=0, width=2)
+        self.y += LINE_HEIGHT // 2
+
+
+def render_purchase_order(data):
+    """Render one purchase order to PDF bytes."""
+    pages = [Page()]
+
+    def page():
+        if pages[-1].full:
+            pages.append(Page())
+        return pages[-1]
+
+    def line(*cells, size=TEXT_SIZE):
+        p = page()
+        for x, value in cells:
+            p.text(x, value, size=size)
+        p.y += LINE_HEIGHT if size == TEXT_SIZE else size + 20
+
+    line((MARGIN, "PURCHASE ORDER"), size=TITLE_SIZE)
+    line((MARGIN, f"PO Number: {data['number']}"), (COLUMNS["price"], f"Date: {data['date']}"))
+    line((MARGIN, f"Request: #{data['id']} - {data['title']}"))
+    line((MARGIN, f"Requested by: {data['requested_by']}"))
+    for text in textwrap.wrap(data["description"] or "", width=90):
+        line((MARGIN, text))
+
+    page().y += LINE_HEIGHT
+    line((COLUMNS["item"], "Item"), (COLUMNS["qty"], "Qty"), (COLUMNS["price"], "Unit Price"), (COLUMNS["total"], "Total"))
+    page().rule()
+    for item in data["items"]:
+        line(
+            (COLUMNS["item"], textwrap.shorten(item["name"], width=48, placeholder="...")),
+            (COLUMNS["qty"], item["qty"]),
+            (COLUMNS["price"], item["price"]),
+            (COLUMNS["total"], item["total"]),
+        )
+    page().rule()
+    line((COLUMNS["price"], "Amount"), (COLUMNS["total"], data["amount"]))
+
+    page().y += LINE_HEIGHT
+    line((MARGIN, "Approvals"))
+    for step in data["approvals"]:
+        line((MARGIN, f"Level {step['level']}: {step['approver']} ({step['date']})"))
+
+    buffer = io.BytesIO()
+    images = [p.image for p in pages]
+    images[0].save(buffer, "PDF", save_all=True, append_images=images[1:], resolution=150)
+    return buffer.getvalue()
@@ -0,0 +1,258 @@
+import time
+import logging
+from bisect import bisect_right
+from psycopg2.extras import NumericRange
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, OuterRef, Q, Value, When
+from django.utils import timezone
+
+from apps.core.cache import Namespace
+from apps.purchases import audit, routing
+from apps.purchases.constants import PurchaseStatus, ApprovalStatus, AuditAction, JobStatus
+from apps.purchases.events import announce_status_change
+from apps.purchases.models import ApprovalPolicy, ApprovalStep, PolicyReapplication, PurchaseRequest
+
+
+logger = logging.getLogger(__name__)
+
+ANY = ""  # blank department / category on a policy matches every request
+
+policy_cache = Namespace("approval_policies")
+INDEX_CHECK_SECONDS = 1.0
+
+
+
+def active_policies():
+    return ApprovalPolicy.objects.filter(active=True).order_by("min_amount")
+
+
+def matching_policies(amount):
+    # a one-point range: a scalar rhs would be cast to numeric(None, None) by Django
+    return active_policies().filter(amount_range__contains=NumericRange(amount, amount, "[]"))
+
+
+def specificity(policy):
+    # (department, category), (department, any), (any, category), (any, any)
+    return (policy.department == ANY, policy.category == ANY)
+
+
+def level_expression(policies):
+    """
+    SQL equivalent of PurchaseRequest.apply_policy for a set of (possibly
+    unsaved) policies: the most specific active match wins; zero amounts
+    and unmatched amounts keep their current level.
+    """
+    ordered = sorted((p for p in policies if p.active), key=lambda p: (specificity(p), p.min_amount))
+    return Case(
+        When(Q(amount__isnull=True) | Q(amount=0), then=F("required_approval_levels")),
+        *[
+            When(
+                Q(amount__gte=p.min_amount, amount__lte=p.max_amount)
+                & (Q(department=p.department) if p.department else Q())
+                & (Q(category=p.category) if p.category else Q()),
+                then=Value(p.required_approval_levels),
+            )
+            for p in ordered
+        ],
+        default=F("required_approval_levels"),
+        output_field=IntegerField(),
+    )
+
+
+def simulate(queryset, policies):
+    """
+    Evaluate `policies` against every request in `queryset` in one grouped
+    query. Returns the (current level -> proposed level) histogram and totals.
+    """
+    rows = list(
+        queryset.order_by()
+        .annotate(proposed_levels=level_expression(policies))
+        .values("required_approval_levels", "proposed_levels")
+        .annotate(count=Count("pk"))
+        .order_by("required_approval_levels", "proposed_levels")
+    )
+
+    histogram = [
+        {"current_levels": row["required_approval_levels"], "proposed_levels": row["proposed_levels"], "count": row["count"]}
+        for row in rows
+    ]
+    changed = [row for row in histogram if row["current_levels"] != row["proposed_levels"]]
+    return {
+        "total": sum(row["count"] for row in histogram),
+        "changed": sum(row["count"] for row in changed),
+        "raised": sum(row["count"] for row in changed if row["proposed_levels"] > row["current_levels"]),
+        "lowered": sum(row["count"] for row in changed if row["proposed_levels"] < row["current_levels"]),
+        "histogram": histogram,
+    }
+
+
+
+# ----------------- RESOLUTION -----------------
+class PolicyIndex:
+    """
+    Active policies compiled for in-process lookup: department -> category
+    -> interval index, with ANY as the wildcard key at both levels. Ranges
+    under one (department, category) are disjoint (exclusion constraint),
+    so each interval index is a sorted list of min_amounts searched with
+    bisect. A lookup probes at most four keys, most specific first.
+    """
+
+    def __init__(self, policies):
+        self.tree = {}
+        for policy in sorted(policies, key=lambda p: p.min_amount):
+            mins, ordered = self.tree.setdefault(policy.department, {}).setdefault(policy.category, ([], []))
+            mins.append(policy.min_amount)
+            ordered.append(policy)
+
+    def lookup(self, department, category, amount):
+        for department_key in dict.fromkeys((department or ANY, ANY)):
+            categories = self.tree.get(department_key)
+            if categories is None:
+                continue
+            for category_key in dict.fromkeys((category or ANY, ANY)):
+                intervals = categories.get(category_key)
+                if intervals is None:
+                    continue
+                mins, ordered = intervals
+                i = bisect_right(mins, amount) - 1
+                if i >= 0 and amount <= ordered[i].max_amount:
+                    return ordered[i]
+        return None
+
+
+_index = None
+_index_version = None
+_index_checked_at = 0.0
+
+
+def policy_index():
+    """
+    The process-wide PolicyIndex. Policy writes bump the generation of the
+    approval_policies cache namespace; each process compares it at most
+    every INDEX_CHECK_SECONDS and rebuilds from the database when it moved.
+    """
+    global _index, _index_version, _index_checked_at
+
+    now = time.monotonic()
+    if _index is not None and now - _index_checked_at < INDEX_CHECK_SECONDS:
+        return _index
+
+    version = policy_cache.generation()
+    stale = _index is None or version != _index_version
+    policy_cache.count(hit=not stale)
+    if stale:
+        _index = PolicyIndex(list(active_policies()))
+        _index_version = version
+    _index_checked_at = now
+    return _index
+
+
+def invalidate_policy_index():
+    """Call after a policy write commits; the next lookup in every process rebuilds."""
+    global _index
+    _index = None
+    policy_cache.invalidate()
+
+
+def resolve_policy(department, category, amount):
+    return policy_index().lookup(department, category, amount)
+
+
+# ----------------- RE-APPLICATION -----------------
+def schedule_reapplication(reason):
+    """Queue a re-evaluation of PENDING requests; coalesces with one that has not started yet."""
+    job = PolicyReapplication.objects.filter(status=JobStatus.PENDING).order_by("pk").first()
+    if job is not None:
+        return job
+    return PolicyReapplication.objects.create(reason=reason)
+
+
+def approve_completed(ids):
+    """SQL version of recompute_request_status for requests whose approvals now cover their levels."""
+    approved_steps = Count("approval_steps", filter=Q(approval_steps__status=ApprovalStatus.APPROVED))
+    rejected = ApprovalStep.objects.filter(purchase_request=OuterRef("pk"), status=ApprovalStatus.REJECTED)
+    completed = list(
+        PurchaseRequest.objects.filter(pk__in=ids, status=PurchaseStatus.PENDING)
+        .annotate(approved_steps=approved_steps)
+        .filter(approved_steps__gte=F("required_approval_levels"))
+        .exclude(Exists(rejected))
+        .values_list("pk", "created_by_id")
+    )
+    if not completed:
+        return 0
+
+    PurchaseRequest.objects.filter(pk__in=[pk for pk, _ in completed]).update(status=PurchaseStatus.APPROVED, version=F("version") + 1)
+    routing.cancel_open([pk for pk, _ in completed])
+    for pk, created_by_id in completed:
+        purchase_request = PurchaseRequest(pk=pk, created_by_id=created_by_id, status=PurchaseStatus.APPROVED)
+        audit.record(purchase_request, AuditAction.UPDATE, {"status": [PurchaseStatus.PENDING, PurchaseStatus.APPROVED]}, pk)
+        announce_status_change(purchase_request, PurchaseStatus.PENDING)
+    return len(completed)
+
+
+def reapply_chunk(job, batch_size):
+    """Recompute levels for the next `batch_size` PENDING requests after job.last_id (caller holds a transaction)."""
+    levels = level_expression(list(active_policies()))
+    rows = list(
+        PurchaseRequest.objects.select_for_update()
+        .filter(status=PurchaseStatus.PENDING, pk__gt=job.last_id)
+        .order_by("pk")
+        .annotate(proposed_levels=levels)
+        .values_list("pk", "required_approval_levels", "proposed_levels")[:batch_size]
+    )
+    if not rows:
+        return 0
+
+    changed = {pk: (current, proposed) for pk, current, proposed in rows if current != proposed}
+    if changed:
+        PurchaseRequest.objects.filter(pk__in=changed).update(required_approval_levels=levels, version=F("version") + 1)
+        for pk, (current, proposed) in changed.items():
+            audit.record(PurchaseRequest(pk=pk), AuditAction.UPDATE, {"required_approval_levels": [current, proposed]}, pk)
+
+    job.approved += approve_completed(list(changed))
+    # raised levels need an assignment for the next one; advance() does what an approval would have done
+    for purchase_request in PurchaseRequest.objects.filter(pk__in=changed, status=PurchaseStatus.PENDING):
+        routing.advance(purchase_request)
+    job.changed += len(changed)
+    job.processed += len(rows)
+    job.last_id = rows[-1][0]
+    return len(rows)
+
+
+def reapply_step(batch_size=1000):
+    """
+    Advance the oldest unfinished re-application by one chunk, in one
+    transaction with its progress row. The job row is claimed with SKIP
+    LOCKED, so several workers never process the same chunk; a crash rolls
+    back only the current chunk. Returns the job, or None when idle.
+    """
+    job = None
+    try:
+        with transaction.atomic():
+            job = (
+                PolicyReapplication.objects.select_for_update(skip_locked=True)
+                .filter(status__in=[JobStatus.PENDING, JobStatus.RUNNING])
+                .order_by("pk")
+                .first()
+            )
+            if job is None:
+                return None
+
+            if job.status == JobStatus.PENDING:
+                job.status = JobStatus.RUNNING
+                job.started_at = timezone.now()
+                job.total = PurchaseRequest.objects.filter(status=PurchaseStatus.PENDING).count()
+
+            if reapply_chunk(job, batch_size) < batch_size:
+                job.status = JobStatus.DONE
+                job.finished_at = timezone.now()
+            job.save()
+            return job
+    except Exception as e:
+        if job is None:
+            raise
+        logger.exception("Policy re-application #%s failed", job.pk)
+        PolicyReapplication.objects.filter(pk=job.pk).update(
+            status=JobStatus.FAILED, error=str(e), finished_at=timezone.now()
+        )
+        return None
@@ -0,0 +1,220 @@
+"""
+Read-only fast path for list endpoints.
+
+A ValuesReader produces the same data as `SerializerClass(objs, many=True)`
+from `.values()` rows: nested `many=True` serializers become one bulk
+query per relation, dotted sources such as `created_by.get_full_name` one
+`in_bulk` per related model, and no model or serializer instance is built
+per row. The field plan (columns, kinds, nesting) is compiled once per
+serializer class; every value still goes through the bound DRF field's
+`to_representation`, so rendered JSON is byte-identical.
+"""
+import hashlib
+from functools import lru_cache
+from collections import defaultdict
+from django.db import models
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.fields import empty, get_attribute
+
+from apps.core.cache import Namespace
+
+
+# entry kinds
+COLUMN, FILE, RELATED, CHILDREN = "column", "file", "related", "children"
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+
+def children_ordering(model):
+    """Order of nested many=True children, the same on the values path and on prefetched instances."""
+    return [*(model._meta.ordering or []), model._meta.pk.attname]
+
+
+class Plan:
+    """Serializer layout resolved against its model: what to SELECT and how to rebuild each key."""
+
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class() if fields is None else serializer_class(fields=fields)
+        self.model = serializer.Meta.model
+        self.pk = self.model._meta.pk.attname
+        self.columns = [self.pk]
+        self.relations = []  # what narrow() prefetches for serializers on model instances
+        self.ordered = {}  # {relation: child model} for the ones prefetched in children_ordering
+        # (key, kind, column, extra)
+        self.entries = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            self.entries.append(self.compile(name, field))
+
+    def select(self, column):
+        if column not in self.columns:
+            self.columns.append(column)
+        return column
+
+    def compile(self, name, field):
+        if isinstance(field, serializers.ListSerializer):
+            if not isinstance(field.child, serializers.ModelSerializer):
+                raise UnsupportedField(name)
+            relation = self.model._meta.get_field(field.source)
+            if not relation.one_to_many:
+                raise UnsupportedField(name)
+            child_plan = plan_for(type(field.child))
+            self.relations += [field.source, *(f"{field.source}__{nested}" for nested in child_plan.relations)]
+            self.ordered[field.source] = child_plan.model
+            self.ordered.update({f"{field.source}__{nested}": model for nested, model in child_plan.ordered.items()})
+            return (name, CHILDREN, self.pk, (child_plan, relation.field.attname))
+
+        if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField, serializers.HiddenField)):
+            raise UnsupportedField(name)
+        if field.source == "*":
+            raise UnsupportedField(name)
+
+        first, *rest = field.source.split(".")
+        try:
+            model_field = self.model._meta.get_field(first)
+        except Exception:
+            raise UnsupportedField(name)  # properties and methods on the model
+
+        if rest:
+            if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+                raise UnsupportedField(name)
+            self.relations.append(model_field.name)
+            return (name, RELATED, self.select(model_field.attname), (model_field.related_model, rest))
+        if not model_field.concrete or model_field.many_to_many:
+            raise UnsupportedField(name)
+        if isinstance(field, serializers.RelatedField) and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            raise UnsupportedField(name)
+        if isinstance(model_field, models.FileField):
+            return (name, FILE, self.select(model_field.attname), model_field)
+        return (name, COLUMN, self.select(model_field.attname), None)
+
+
+@lru_cache(maxsize=256)
+def plan_for(serializer_class, fields=None):
+    """Cached per serializer class and sparse fieldset (see SparseFieldsMixin)."""
+    return Plan(serializer_class, fields)
+
+
+
+def narrow(queryset, serializer_class, fields=None):
+    """Load only what the (sparse) serializer reads: its columns, plus prefetches for its relations."""
+    try:
+        plan = plan_for(serializer_class, fields)
+    except UnsupportedField:
+        return queryset
+    lookups = [
+        Prefetch(relation, queryset=plan.ordered[relation]._default_manager.order_by(*children_ordering(plan.ordered[relation])))
+        if relation in plan.ordered else relation
+        for relation in plan.relations
+    ]
+    return queryset.only(*plan.columns).prefetch_related(*lookups)
+
+
+
+class ValuesReader:
+    """Binds a compiled Plan to the fields of one serializer instance (for its context, e.g. the request)."""
+
+    def __init__(self, plan, serializer):
+        self.plan = plan
+        self.bound = []
+        for name, kind, column, extra in plan.entries:
+            field = serializer.fields[name]
+            if kind == CHILDREN:
+                child_plan, fk = extra
+                extra = (ValuesReader(child_plan, field.child), fk)
+            elif kind == RELATED:
+                extra = (*extra, field)
+            elif kind == COLUMN and isinstance(field, serializers.PrimaryKeyRelatedField):
+                # the column already holds the pk that PrimaryKeyRelatedField would output
+                represent = field.pk_field.to_representation if field.pk_field is not None else None
+                self.bound.append((name, kind, column, extra, represent))
+                continue
+            self.bound.append((name, kind, column, extra, field.to_representation))
+
+    @classmethod
+    def for_serializer(cls, serializer_class, context=None, fields=None):
+        """A reader, or None when the serializer uses fields the fast path can't reproduce."""
+        try:
+            plan = plan_for(serializer_class, fields)
+        except UnsupportedField:
+            return None
+        kwargs = {} if fields is None else {"fields": fields}
+        return cls(plan, serializer_class(context=context or {}, **kwargs))
+
+    def values(self, queryset):
+        return queryset.values(*self.plan.columns)
+
+    def represent(self, rows):
+        rows = list(rows)
+        lookups = {}
+        for name, kind, column, extra, represent in self.bound:
+            if kind == RELATED:
+                related_model = extra[0]
+                ids = {row[column] for row in rows if row[column] is not None}
+                # resolved once per distinct related object, not once per row
+                lookups[name] = {
+                    pk: get_attribute(obj, extra[1]) for pk, obj in related_model._default_manager.in_bulk(ids).items()
+                }
+            elif kind == CHILDREN:
+                reader, fk = extra
+                parent_ids = [row[column] for row in rows]
+                children = list(
+                    reader.plan.model._default_manager.filter(**{f"{fk}__in": parent_ids})
+                    .order_by(fk, *children_ordering(reader.plan.model))
+                    .values(*dict.fromkeys([*reader.plan.columns, fk]))
+                )
+                # one represent() over every child, so their own lookups stay one query per page
+                grouped = defaultdict(list)
+                for child, data in zip(children, reader.represent(children)):
+                    grouped[child[fk]].append(data)
+                lookups[name] = grouped
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, kind, column, extra, represent in self.bound:
+                value = row[column]
+                if kind == CHILDREN:
+                    item[name] = lookups[name].get(value, [])
+                    continue
+                if kind == RELATED:
+                    if value is None:
+                        # what Field.get_attribute does when the relation is empty
+                        field = extra[2]
+                        if field.default is not empty:
+                            item[name] = field.get_default()
+                        elif field.allow_null:
+                            item[name] = None
+                        continue
+                    value = lookups[name][value]
+                elif kind == FILE:
+                    value = extra.attr_class(None, extra, value) if value is not None else None
+
+                if value is None:
+                    item[name] = None
+                elif represent is None:
+                    item[name] = value
+                else:
+                    item[name] = represent(value)
+            data.append(item)
+        return data
+
+
+
+# ----------------- PAYLOAD CACHE -----------------
+# Detail representations of purchase requests, scoped by request id. Keys carry the request's
+# version; child and user changes invalidate through apps.purchases signals.
+request_payloads = Namespace("request_payloads")
+
+
+def payload_key(version, serializer_class, fields, base_url):
+    """Everything besides the row itself that changes the rendered payload (file URLs embed the host)."""
+    fieldset = ",".join(sorted(fields)) if fields is not None else "*"
+    digest = hashlib.sha1(f"{serializer_class.__qualname__}|{fieldset}|{base_url}".encode()).hexdigest()
+    return f"{version}:{digest}"
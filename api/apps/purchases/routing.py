@@ -0,0 +1,109 @@
+import logging
+from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.usr.constants import UserRole
+from apps.purchases.constants import PurchaseStatus, AssignmentStatus
+from apps.purchases.models import ApprovalAssignment, ApprovalStep, ApproverPool
+
+
+logger = logging.getLogger(__name__)
+
+
+
+# ----------------- ASSIGNMENT -----------------
+def pool_for(purchase_request, level):
+    """The active pool for `level`: the request's department pool first, then the catch-all one."""
+    pools = ApproverPool.objects.filter(active=True, level=level, department__in={purchase_request.department, ""})
+    return min(pools, key=lambda pool: pool.department == "", default=None)
+
+
+def excluded_approvers(purchase_request):
+    # the requester, and anyone who already acted on or holds a level of this request
+    excluded = set(ApprovalStep.objects.filter(purchase_request=purchase_request).values_list("approver_id", flat=True))
+    excluded |= set(
+        ApprovalAssignment.objects.filter(purchase_request=purchase_request, status=AssignmentStatus.OPEN)
+        .values_list("approver_id", flat=True)
+    )
+    excluded.add(purchase_request.created_by_id)
+    return excluded
+
+
+def least_loaded(pool, exclude):
+    """Pool member with the fewest open assignments (counted off the partial assignment_open_idx)."""
+    queue_depth = (
+        ApprovalAssignment.objects.filter(approver=OuterRef("pk"), status=AssignmentStatus.OPEN)
+        .values("approver")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return (
+        get_user_model().objects.filter(approver_pools=pool, is_active=True, role=UserRole.APPROVER)
+        .exclude(pk__in=exclude)
+        .annotate(queue_depth=Coalesce(Subquery(queue_depth), Value(0)))
+        .order_by("queue_depth", "pk")
+        .first()
+    )
+
+
+def assign_level(purchase_request, level):
+    """Assign `level` to the least-loaded eligible member of its pool. No pool: any approver may act."""
+    pool = pool_for(purchase_request, level)
+    if pool is None:
+        return None
+
+    # serializes picks within one pool, so concurrent requests don't all land on the same approver
+    ApproverPool.objects.select_for_update().filter(pk=pool.pk).exists()
+    approver = least_loaded(pool, excluded_approvers(purchase_request))
+    if approver is None:
+        logger.warning("No eligible approver in %s for request #%s", pool, purchase_request.pk)
+        return None
+
+    return ApprovalAssignment.objects.create(purchase_request=purchase_request, level=level, approver=approver, pool=pool)
+
+
+def advance(purchase_request):
+    """
+    Keep assignments in step with the request: levels that were acted on
+    are completed, the next level is assigned while the request is PENDING,
+    and anything still open is cancelled once it is final.
+    """
+    acted = set(purchase_request.approval_steps.values_list("level", flat=True))
+    now = timezone.now()
+    ApprovalAssignment.objects.filter(
+        purchase_request=purchase_request, level__in=acted, status=AssignmentStatus.OPEN
+    ).update(status=AssignmentStatus.COMPLETED, closed_at=now)
+
+    if purchase_request.status != PurchaseStatus.PENDING:
+        cancel_open([purchase_request.pk])
+        return
+
+    next_level = max(acted, default=0) + 1
+    already_assigned = ApprovalAssignment.objects.filter(
+        purchase_request=purchase_request, level=next_level, status=AssignmentStatus.OPEN
+    ).exists()
+    if next_level <= purchase_request.required_approval_levels and not already_assigned:
+        assign_level(purchase_request, next_level)
+
+
+def cancel_open(request_ids):
+    return ApprovalAssignment.objects.filter(
+        purchase_request_id__in=request_ids, status=AssignmentStatus.OPEN
+    ).update(status=AssignmentStatus.CANCELLED, closed_at=timezone.now())
+
+
+
+# ----------------- ENFORCEMENT -----------------
+def approval_error(purchase_request, user, level):
+    """Why `user` may not approve/reject `level` of the request, or None."""
+    if ApprovalStep.objects.filter(purchase_request=purchase_request, approver=user).exists():
+        return "You have already acted on another approval level of this request."
+
+    assignment = ApprovalAssignment.objects.filter(
+        purchase_request=purchase_request, level=level, status=AssignmentStatus.OPEN
+    ).first()
+    if assignment is not None and assignment.approver_id != user.pk:
+        return "This approval level is assigned to another approver."
+    return None
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Concat
+
+from apps.core.transactions import add_on_commit
+from apps.purchases.models import PurchaseRequest, RequestItem
+
+
+SEARCH_CONFIG = "english"
+TRIGRAM_MIN_LENGTH = 3
+
+
+
+# ----------------- MAINTENANCE -----------------
+def search_vector_expression():
+    """title (A), description (B), item names (C) and creator name (D), as one UPDATE expression."""
+    item_names = (
+        RequestItem.objects.filter(purchase_request=OuterRef("pk"))
+        .values("purchase_request")
+        .annotate(names=StringAgg("item_name", delimiter=" "))
+        .values("names")
+    )
+    creator_name = (
+        get_user_model().objects.filter(pk=OuterRef("created_by_id"))
+        .annotate(name=Concat("first_name", Value(" "), "last_name"))
+        .values("name")
+    )
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(item_names), weight="C", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(creator_name), weight="D", config="simple")
+    )
+
+
+def refresh_search_vectors(queryset):
+    return queryset.update(search_vector=search_vector_expression())
+
+
+class SearchRefresh:
+    """on_commit callback collecting the request ids written in one transaction."""
+
+    def __init__(self):
+        self.ids = set()
+
+    def add(self, request_id):
+        self.ids.add(request_id)
+
+    def __call__(self):
+        refresh_search_vectors(PurchaseRequest.objects.filter(pk__in=self.ids))
+
+
+def schedule_search_refresh(request_id):
+    """Refresh once per transaction, however many items were written in it."""
+    add_on_commit(SearchRefresh, request_id)
+
+
+
+# ----------------- QUERYING -----------------
+def search_requests(queryset, term):
+    """Ranked full-text match; falls back to trigram similarity for typos and partial words."""
+    query = SearchQuery(term, search_type="websearch", config=SEARCH_CONFIG)
+    results = (
+        queryset.filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "-created_at")
+    )
+    if len(term) < TRIGRAM_MIN_LENGTH or results.exists():
+        return results
+
+    similar_items = RequestItem.objects.filter(purchase_request=OuterRef("pk"), item_name__trigram_similar=term)
+    return (
+        queryset.filter(Q(title__trigram_similar=term) | Exists(similar_items))
+        .annotate(rank=TrigramSimilarity("title", term))
+        .order_by("-rank", "-created_at")
+    )
@@ -1,7 +1,9 @@
 from rest_framework import serializers
+from django.db import IntegrityError, transaction
+from psycopg2.extras import NumericRange
 from django.contrib.auth import get_user_model
-from .models import PurchaseRequest, RequestItem, ApprovalStep, FinanceNote, ApprovalPolicy
-from apps.purchases.constants import PurchaseStatus, ApprovalStatus
+from .models import PurchaseRequest, RequestItem, ApprovalStep, FinanceNote, ApprovalPolicy, PolicyReapplication
+from apps.purchases.constants import PurchaseStatus, ApprovalStatus, JobStatus
 
 
 
@@ -41,8 +43,9 @@ class PurchaseRequestCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PurchaseRequest
-        fields = ["id", "title", "description", "amount", "proforma_invoice", "items",]
+        fields = ["id", "title", "description", "department", "category", "amount", "proforma_invoice", "items", "version",]
 
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop("items")
         user = self.context["request"].user
@@ -51,11 +54,14 @@ class PurchaseRequestCreateSerializer(serializers.ModelSerializer):
             RequestItem.objects.create(purchase_request=request_obj, **item_data)
         return request_obj
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         items_data = validated_data.pop("items", None)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
+        if instance.status == PurchaseStatus.PENDING:
+            instance.apply_policy()  # department / category may select another policy
         instance.save()
 
         if items_data is not None:
@@ -69,7 +75,45 @@ class PurchaseRequestCreateSerializer(serializers.ModelSerializer):
 
 
 # read-only views with all details
-class PurchaseRequestSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    `fields=[...]` keeps only those fields. Clients pick them with
+    `?fields=` and `?expand=` (see `selected_fields`); the nested
+    relations in `expandable_fields` are only embedded when asked for.
+    """
+    expandable_fields = ()
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, params):
+        """Field names selected by the query params, or None (no params) for the full representation."""
+        split = lambda value: [name.strip() for name in value.split(",") if name.strip()]
+        fields = split(params.get("fields", ""))
+        expand = split(params.get("expand", ""))
+        if not fields and not expand:
+            return None
+
+        available = cls.Meta.fields
+        unknown = [name for name in fields if name not in available]
+        if unknown:
+            raise serializers.ValidationError({"fields": f"unknown field(s) {', '.join(unknown)}; expected any of {', '.join(available)}"})
+        unknown = [name for name in expand if name not in cls.expandable_fields]
+        if unknown:
+            raise serializers.ValidationError({"expand": f"unknown relation(s) {', '.join(unknown)}; expected any of {', '.join(cls.expandable_fields)}"})
+
+        if not fields:
+            fields = [name for name in available if name not in cls.expandable_fields]
+        return frozenset(["id", *fields, *expand])
+
+
+class PurchaseRequestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ("items", "approval_steps", "finance_notes")
+
     items = RequestItemSerializer(many=True, read_only=True)
     approval_steps = ApprovalStepSerializer(many=True, read_only=True)
     finance_notes = FinanceNoteSerializer(many=True, read_only=True)
@@ -84,11 +128,14 @@ class PurchaseRequestSerializer(serializers.ModelSerializer):
             "amount",
             "status",
             "required_approval_levels",
+            "department",
+            "category",
             "proforma_invoice",
             "purchase_order",
             "receipt",
             "created_at",
             "updated_at",
+            "version",
             "created_by_name",
             "items",
             "approval_steps",
@@ -102,7 +149,7 @@ class PurchaseRequestSerializer(serializers.ModelSerializer):
 class FinanceUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = PurchaseRequest
-        fields = ["purchase_order", "receipt"]
+        fields = ["purchase_order", "receipt", "version"]
 
     def update(self, instance, validated_data):
         for field in ["purchase_order", "receipt"]:
@@ -117,12 +164,13 @@ class FinanceUpdateSerializer(serializers.ModelSerializer):
 class ApprovalPolicySerializer(serializers.ModelSerializer):
     class Meta:
         model = ApprovalPolicy
-        fields = ["id", "title", "min_amount", "max_amount", "required_approval_levels", "active", "created_at",]
+        fields = ["id", "title", "department", "category", "min_amount", "max_amount", "required_approval_levels", "active", "created_at",]
         read_only_fields = ["id", "created_at"]
 
     def validate(self, data):
-        min_amount = data.get("min_amount")
-        max_amount = data.get("max_amount")
+        # partial updates are checked against the stored values of omitted fields
+        min_amount = data.get("min_amount", getattr(self.instance, "min_amount", None))
+        max_amount = data.get("max_amount", getattr(self.instance, "max_amount", None))
 
         if min_amount is not None and max_amount is not None:
             if min_amount > max_amount:
@@ -130,9 +178,104 @@ class ApprovalPolicySerializer(serializers.ModelSerializer):
                     "min_amount": "Minimum amount cannot be greater than maximum amount."
                 })
 
-        if data.get("required_approval_levels", 0) < 1:
+        if data.get("required_approval_levels", getattr(self.instance, "required_approval_levels", 0)) < 1:
             raise serializers.ValidationError({
                 "required_approval_levels": "Approval levels must be greater than zero."
             })
 
-        return data
\ No newline at end of file
+        if data.get("active", getattr(self.instance, "active", True)):
+            department = data.get("department", getattr(self.instance, "department", ""))
+            category = data.get("category", getattr(self.instance, "category", ""))
+            self.validate_no_overlap(department, category, min_amount, max_amount)
+
+        return data
+
+    def validate_no_overlap(self, department, category, min_amount, max_amount):
+        # Friendly error for the approval_policy_no_overlap exclusion constraint
+        amount_range = NumericRange(
+            min_amount if min_amount is not None else ApprovalPolicy._meta.get_field("min_amount").default,
+            max_amount if max_amount is not None else ApprovalPolicy._meta.get_field("max_amount").default,
+            "[]",
+        )
+        overlapping = ApprovalPolicy.objects.filter(
+            active=True, department=department, category=category, amount_range__overlap=amount_range
+        )
+        if self.instance is not None:
+            overlapping = overlapping.exclude(pk=self.instance.pk)
+        policy = overlapping.first()
+        if policy is not None:
+            raise serializers.ValidationError({
+                "min_amount": f"Amount range overlaps the active policy '{policy.title}' ({policy.min_amount} - {policy.max_amount})."
+            })
+
+    def save(self, **kwargs):
+        # a concurrent write can still hit the constraint between validation and INSERT/UPDATE
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            raise serializers.ValidationError({
+                "min_amount": "Amount range overlaps another active policy."
+            })
+
+
+class ProposedPolicySerializer(ApprovalPolicySerializer):
+    # checked against the rest of the proposed set instead of the live policies
+    def validate_no_overlap(self, department, category, min_amount, max_amount):
+        pass
+
+
+# proposed policy set to evaluate against existing requests (nothing is saved)
+class PolicySimulationSerializer(serializers.Serializer):
+    policies = ProposedPolicySerializer(many=True, allow_empty=False)
+    status = serializers.ListField(
+        child=serializers.ChoiceField(choices=PurchaseStatus.choices),
+        default=[PurchaseStatus.PENDING],
+        allow_empty=False,
+    )
+    amount_min = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    amount_max = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+
+    def validate_policies(self, policies):
+        # same rule as the exclusion constraint: active ranges of one department/category must be disjoint
+        scopes = {}
+        for p in policies:
+            if p.get("active", True):
+                scopes.setdefault((p.get("department", ""), p.get("category", "")), []).append(p)
+        for scoped in scopes.values():
+            self.validate_disjoint(sorted(scoped, key=lambda p: p.get("min_amount", 0)))
+        return policies
+
+    def validate_disjoint(self, active):
+        for previous, policy in zip(active, active[1:]):
+            if policy.get("min_amount", 0) <= previous.get("max_amount", ApprovalPolicy._meta.get_field("max_amount").default):
+                raise serializers.ValidationError(f"Policies '{previous['title']}' and '{policy['title']}' have overlapping amount ranges.")
+
+    def validate(self, data):
+        if "amount_min" in data and "amount_max" in data and data["amount_min"] > data["amount_max"]:
+            raise serializers.ValidationError({"amount_min": "Minimum amount cannot be greater than maximum amount."})
+        return data
+
+    def proposed_policies(self):
+        return [ApprovalPolicy(**policy) for policy in self.validated_data["policies"]]
+
+
+
+class PolicyReapplicationSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PolicyReapplication
+        fields = [
+            "id", "reason", "status", "total", "processed", "changed", "approved", "progress",
+            "error", "created_at", "started_at", "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        # total is counted when the job starts; requests created since can push processed past it
+        if obj.status == JobStatus.DONE:
+            return 100
+        if not obj.total:
+            return 0
+        return min(99, obj.processed * 100 // obj.total)
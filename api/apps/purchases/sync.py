@@ -0,0 +1,153 @@
+"""
+Delta sync for offline clients, read off the audit log.
+
+Events are written in the transaction of their change and carry its id
+(`txid`). The change token is a transaction id: everything from
+transactions below it has been sent. A page only reads transactions
+below the xmin of a fresh snapshot, which have all ended, so a slow
+transaction can't commit an event behind a client's token; it is read
+once it ends, however long that takes. Pages end on a transaction
+boundary.
+"""
+from django.db import connections, router
+from django.db.models import Q
+
+from apps.purchases.constants import AuditAction
+from apps.purchases.models import AuditEvent, PurchaseRequest, RequestItem, ApprovalStep, FinanceNote
+from apps.purchases.readers import ValuesReader
+from apps.purchases.serializers import RequestItemSerializer, ApprovalStepSerializer, FinanceNoteSerializer
+
+
+MAX_EVENTS = 1000
+
+REMOVED = {AuditAction.DELETE, AuditAction.ARCHIVE}
+
+# audit model name -> (response key, model, serializer)
+CHILDREN = {
+    "requestitem": ("items", RequestItem, RequestItemSerializer),
+    "approvalstep": ("approval_steps", ApprovalStep, ApprovalStepSerializer),
+    "financenote": ("finance_notes", FinanceNote, FinanceNoteSerializer),
+}
+REQUEST = PurchaseRequest._meta.model_name
+
+
+
+def horizon():
+    """Transactions below this id have all ended; later ones may still be running."""
+    with connections[router.db_for_read(AuditEvent)].cursor() as cursor:
+        cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return cursor.fetchone()[0]
+
+
+def current_token():
+    """Token to start syncing from; take it before loading the full list."""
+    return horizon()
+
+
+def settled_events(since, limit=MAX_EVENTS):
+    """Events of the ended transactions from `since` on, whole transactions only. Returns (events, next token, has_more)."""
+    until = horizon()  # before reading events: a later snapshot only sees more of them
+    events = list(
+        AuditEvent.objects.filter(txid__gte=since, txid__lt=until)
+        .order_by("txid", "id")
+        .values("id", "txid", "purchase_request_id", "model", "object_id", "action")[:limit + 1]
+    )
+    if len(events) <= limit:
+        return events, until, False
+
+    cut = events[limit]["txid"]
+    if events[0]["txid"] == cut:  # one transaction bigger than a page is sent whole
+        events = list(
+            AuditEvent.objects.filter(txid=cut)
+            .order_by("id")
+            .values("id", "txid", "purchase_request_id", "model", "object_id", "action")
+        )
+        return events, cut + 1, True
+    return [event for event in events if event["txid"] != cut], cut, True
+
+
+def created_by(request_ids, user):
+    """Which of `request_ids` `user` created, from the CREATE events (the rows may be gone)."""
+    return set(
+        AuditEvent.objects.filter(
+            model=REQUEST, action=AuditAction.CREATE, object_id__in=request_ids, changes__created_by_id=user.pk
+        ).values_list("object_id", flat=True)
+    )
+
+
+def had_status(request_ids, statuses):
+    """Which of `request_ids` were created in or moved into one of `statuses`, from their events (the rows may be gone)."""
+    return set(
+        AuditEvent.objects.filter(model=REQUEST, object_id__in=request_ids)
+        .filter(Q(action=AuditAction.CREATE, changes__status__in=statuses) | Q(action=AuditAction.UPDATE, changes__status__1__in=statuses))
+        .values_list("object_id", flat=True)
+    )
+
+
+def changes_since(since, visible, serializer_class, context, owner=None, statuses=None):
+    """
+    Everything in `visible` (the caller's request queryset) that changed
+    after the token `since`, as:
+
+    - purchase_requests: full list representation of every request that
+      changed itself, including its children;
+    - items / approval_steps / finance_notes: changed children of the
+      other requests, each with its purchase_request id;
+    - deleted: tombstone ids per key. Requests that were deleted, archived
+      or left the caller's scope. Only requests the caller could have
+      seen are reported: pass `owner` for the ones that user created,
+      `statuses` for the ones that were in one of them.
+    """
+    events, next_token, has_more = settled_events(since)
+
+    # the last action on each object decides between upsert and tombstone; writes to one row are
+    # serialized by its lock, so the later one has the higher id even when its transaction started first
+    last = {}
+    for event in sorted(events, key=lambda event: event["id"]):
+        last[event["model"], event["object_id"]] = event
+
+    request_ids = {event["purchase_request_id"] for event in events}
+    visible_ids = set(visible.filter(pk__in=request_ids).values_list("pk", flat=True))
+
+    changed_requests = {
+        object_id for (model, object_id), event in last.items()
+        if model == REQUEST and event["action"] not in REMOVED and object_id in visible_ids
+    }
+    gone = request_ids - visible_ids
+    if owner is not None:
+        gone = created_by(gone, owner)
+    if statuses is not None:
+        gone = had_status(gone, statuses)
+
+    reader = ValuesReader.for_serializer(serializer_class, context)
+    result = {
+        "next": next_token,
+        "has_more": has_more,
+        "purchase_requests": reader.represent(reader.values(visible.filter(pk__in=changed_requests).order_by("pk"))),
+        "deleted": {"purchase_requests": sorted(gone)},
+    }
+
+    # children of requests sent in full are already in their representation
+    partial = visible_ids - changed_requests
+    for model_name, (key, child_model, child_serializer) in CHILDREN.items():
+        upserts, removed = set(), []
+        for (model, object_id), event in last.items():
+            if model != model_name or event["purchase_request_id"] not in partial:
+                continue
+            if event["action"] in REMOVED:
+                removed.append(object_id)
+            else:
+                upserts.add(object_id)
+
+        child_reader = ValuesReader.for_serializer(child_serializer, context)
+        rows = list(
+            child_model.objects.filter(pk__in=upserts, purchase_request_id__in=partial)
+            .order_by("pk")
+            .values(*dict.fromkeys([*child_reader.plan.columns, "purchase_request_id"]))
+        )
+        result[key] = [
+            {**data, "purchase_request": row["purchase_request_id"]}
+            for row, data in zip(rows, child_reader.represent(rows))
+        ]
+        result["deleted"][key] = sorted(removed)
+    return result
@@ -1,3 +1,247 @@
-from django.test import TestCase
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Prefetch
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
-# Create your tests here.
+from apps.core.models import IdempotencyKey
+from apps.core.renderers import ORJSONRenderer
+from apps.usr.models import User
+from apps.purchases.models import PurchaseRequest, RequestItem, ApprovalStep, FinanceNote
+from apps.purchases.readers import ValuesReader, children_ordering, narrow
+from apps.purchases.serializers import PurchaseRequestSerializer
+from apps.purchases.sync import current_token, settled_events
+
+
+class ReaderParityTests(TestCase):
+    """The ValuesReader fast path must render what the serializer renders on a narrow()ed load."""
+
+    @classmethod
+    def setUpTestData(cls):
+        staff = User.objects.create_user(email="staff@example.com", password="pw12345678", role="staff", first_name="Sam", last_name="Lee")
+        approver = User.objects.create_user(email="approver@example.com", password="pw12345678", role="approver", first_name="Ann", last_name="Bo")
+        manager = User.objects.create_user(email="manager@example.com", password="pw12345678", role="approver", first_name="Max", last_name="Oy")
+        finance = User.objects.create_user(email="finance@example.com", password="pw12345678", role="finance", first_name="Fi", last_name="Na")
+        for i in range(6):
+            request = PurchaseRequest.objects.create(
+                created_by=staff,
+                title=f"Request {i}",
+                description=None if i % 2 else "Office supplies",
+                amount=Decimal("12.50") * i,
+                department="ops" if i % 3 else "",
+                proforma_invoice="proforma/quote.pdf" if i % 2 == 0 else "",
+            )
+            for j in range(i % 4):
+                RequestItem.objects.create(purchase_request=request, item_name=f"item {j}", qty=j + 1, price=Decimal("3.10"))
+            if i % 2 == 0:
+                ApprovalStep.objects.create(purchase_request=request, approver=approver, level=2, status="APPROVED", comments="ok")
+                ApprovalStep.objects.create(purchase_request=request, approver=manager, level=1, status="APPROVED")
+            if i % 3 == 0:
+                FinanceNote.objects.create(purchase_request=request, finance_user=finance, note="paid")
+
+    def setUp(self):
+        self.context = {"request": Request(APIRequestFactory().get("/api/purchases/requests/"))}
+        self.queryset = PurchaseRequest.objects.order_by("-created_at", "-pk")
+
+    def render(self, data):
+        return ORJSONRenderer().render(data)
+
+    def assert_parity(self, fields=None):
+        kwargs = {} if fields is None else {"fields": fields}
+        instances = list(narrow(self.queryset, PurchaseRequestSerializer, fields))
+        expected = PurchaseRequestSerializer(instances, many=True, context=self.context, **kwargs).data
+
+        reader = ValuesReader.for_serializer(PurchaseRequestSerializer, self.context, fields)
+        self.assertIsNotNone(reader)
+        self.assertEqual(self.render(reader.represent(reader.values(self.queryset))), self.render(expected))
+
+    def test_full_representation_matches(self):
+        self.assert_parity()
+
+    def test_sparse_fieldsets_match(self):
+        self.assert_parity(frozenset(["id", "title", "created_by_name"]))
+        self.assert_parity(frozenset(["id", "amount", "items", "approval_steps"]))
+
+    def test_children_in_the_same_order_on_both_paths(self):
+        reader = ValuesReader.for_serializer(PurchaseRequestSerializer, self.context)
+        fast = reader.represent(reader.values(self.queryset))
+        instances = narrow(self.queryset, PurchaseRequestSerializer)
+        for row, instance in zip(fast, instances):
+            for relation in ["items", "approval_steps", "finance_notes"]:
+                self.assertEqual([child["id"] for child in row[relation]], [child.pk for child in getattr(instance, relation).all()])
+
+    def test_narrow_prefetches_children_ordered(self):
+        lookups = {
+            lookup.prefetch_through: lookup
+            for lookup in narrow(self.queryset, PurchaseRequestSerializer)._prefetch_related_lookups
+            if isinstance(lookup, Prefetch)
+        }
+        for relation, model in [("items", RequestItem), ("approval_steps", ApprovalStep), ("finance_notes", FinanceNote)]:
+            self.assertIn(relation, lookups)
+            self.assertEqual(list(lookups[relation].queryset.query.order_by), children_ordering(model))
+
+
+
+def api_client(user):
+    for alias in settings.CACHES:  # throttle buckets and cached payloads outlive the test
+        caches[alias].clear()
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+
+class IdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        staff = User.objects.create_user(email="staff@example.com", password="pw12345678", role="staff", first_name="Sam", last_name="Lee")
+        cls.approver = User.objects.create_user(email="approver@example.com", password="pw12345678", role="approver", first_name="Ann", last_name="Bo")
+        cls.request = PurchaseRequest.objects.create(created_by=staff, title="Laptops", amount=Decimal("900.00"))
+
+    def setUp(self):
+        self.client = api_client(self.approver)
+        self.url = f"/api/purchases/requests/{self.request.pk}/approve/"
+
+    def approve(self, key, comments="ok"):
+        return self.client.patch(self.url, {"comments": comments}, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.approve("key-1")
+        retry = self.approve("key-1")
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual((retry.status_code, retry.data), (first.status_code, first.data))
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(ApprovalStep.objects.filter(purchase_request=self.request).count(), 1)
+
+    def test_key_reused_for_another_body(self):
+        self.approve("key-1")
+        response = self.approve("key-1", comments="changed my mind")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(ApprovalStep.objects.filter(purchase_request=self.request).count(), 1)
+
+    def test_key_still_in_progress(self):
+        self.approve("key-1")
+        IdempotencyKey.objects.filter(key="key-1").update(response_status=None, created_at=timezone.now())
+        self.assertEqual(self.approve("key-1").status_code, status.HTTP_409_CONFLICT)
+
+    def test_keys_are_per_user(self):
+        manager = User.objects.create_user(email="manager@example.com", password="pw12345678", role="approver", first_name="Max", last_name="Oy")
+        self.approve("key-1")
+        self.client.force_authenticate(manager)
+        response = self.approve("key-1")  # the next level, not a replay of the first approver's
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(ApprovalStep.objects.filter(purchase_request=self.request).count(), 2)
+
+
+
+class IfMatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(email="staff@example.com", password="pw12345678", role="staff", first_name="Sam", last_name="Lee")
+        cls.request = PurchaseRequest.objects.create(created_by=cls.staff, title="Laptops", amount=Decimal("900.00"))
+
+    def setUp(self):
+        self.client = api_client(self.staff)
+        self.url = f"/api/purchases/requests/{self.request.pk}/"
+
+    def test_etag_is_the_version(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["ETag"], f'"{self.request.version}"')
+
+    def test_current_version_writes(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.patch(self.url, {"title": "Desktops"}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_stale_version_is_refused(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.patch(self.url, {"title": "Desktops"}, format="json")  # someone else's write
+        response = self.client.patch(self.url, {"title": "Monitors"}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.title, "Desktops")
+
+    def test_writes_without_if_match_are_not_checked(self):
+        stale = PurchaseRequest.objects.get(pk=self.request.pk)
+        self.client.patch(self.url, {"title": "Desktops"}, format="json")
+        stale.title = "Monitors"
+        stale.save()  # last write wins
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.title, "Monitors")
+
+
+
+class ChangesTests(TransactionTestCase):
+    """Committed transactions, so their events fall below the token horizon."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email="staff@example.com", password="pw12345678", role="staff", first_name="Sam", last_name="Lee")
+        self.other = User.objects.create_user(email="other@example.com", password="pw12345678", role="staff", first_name="Oli", last_name="Ng")
+        self.finance = User.objects.create_user(email="finance@example.com", password="pw12345678", role="finance", first_name="Fi", last_name="Na")
+        self.kept = PurchaseRequest.objects.create(created_by=self.staff, title="Laptops", amount=Decimal("900.00"))
+        self.removed = PurchaseRequest.objects.create(created_by=self.staff, title="Chairs", amount=Decimal("80.00"))
+        self.foreign = PurchaseRequest.objects.create(created_by=self.other, title="Desks", amount=Decimal("300.00"))
+        self.client = api_client(self.staff)
+
+    def changes(self, since=None, client=None):
+        params = {} if since is None else {"since": since}
+        response = (client or self.client).get("/api/purchases/requests/changes/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_changes_and_tombstones_since_the_token(self):
+        token = self.changes()["next"]
+        self.kept.title = "Laptops (refurbished)"
+        self.kept.save()
+        removed_id = self.removed.pk
+        self.removed.delete()
+        self.foreign.delete()
+
+        data = self.changes(token)
+        self.assertEqual([row["id"] for row in data["purchase_requests"]], [self.kept.pk])
+        self.assertEqual(data["purchase_requests"][0]["title"], "Laptops (refurbished)")
+        # another staff member's request never was in this user's list
+        self.assertEqual(data["deleted"]["purchase_requests"], [removed_id])
+        self.assertFalse(data["has_more"])
+        self.assertGreater(data["next"], token)
+
+        data = self.changes(data["next"])
+        self.assertEqual(data["purchase_requests"], [])
+        self.assertEqual(data["deleted"]["purchase_requests"], [])
+
+    def test_child_changes_of_unchanged_requests(self):
+        token = self.changes()["next"]
+        note = FinanceNote.objects.create(purchase_request=self.kept, finance_user=self.finance, note="budget checked")
+
+        data = self.changes(token)
+        self.assertEqual(data["purchase_requests"], [])
+        self.assertEqual([(row["id"], row["purchase_request"]) for row in data["finance_notes"]], [(note.pk, self.kept.pk)])
+
+    def test_tombstones_only_for_requests_the_role_could_see(self):
+        finance = api_client(self.finance)
+        token = self.changes(client=finance)["next"]
+        self.removed.delete()  # PENDING: never in finance's list
+        self.assertEqual(self.changes(token, client=finance)["deleted"]["purchase_requests"], [])
+
+    def test_pages_end_on_a_transaction_boundary(self):
+        since = current_token()
+        self.kept.title = "Laptops (refurbished)"
+        self.kept.save()
+        self.removed.title = "Chairs (used)"
+        self.removed.save()
+
+        events, token, has_more = settled_events(since, limit=1)
+        self.assertTrue(has_more)
+        self.assertEqual({event["object_id"] for event in events}, {self.kept.pk})
+        events, token, has_more = settled_events(token, limit=1)
+        self.assertEqual({event["object_id"] for event in events}, {self.removed.pk})
+
+    def test_token_must_be_a_number(self):
+        response = self.client.get("/api/purchases/requests/changes/", {"since": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -4,7 +4,8 @@ from rest_framework_nested import routers
 from apps.purchases.views import (
     PurchaseRequestViewSet,
     FinanceNoteViewSet,
-    ApprovalPolicyViewSet
+    ApprovalPolicyViewSet,
+    request_status_stream,
 )
 
 router = routers.SimpleRouter()
@@ -17,6 +18,7 @@ requests_router.register("finance_notes", FinanceNoteViewSet, basename="finance-
 
 
 urlpatterns = [
+    path("requests/events/", request_status_stream, name="request-status-events"),
     path("", include(router.urls)),
     path("", include(requests_router.urls)),
 ]
\ No newline at end of file
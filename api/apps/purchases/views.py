@@ -1,14 +1,37 @@
+import csv
 import uuid
-from rest_framework import viewsets, mixins, status
+import json
+import asyncio
+from itertools import chain
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from rest_framework import viewsets, mixins, status, exceptions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import ParseError
+from rest_framework.exceptions import ParseError, ValidationError
 
 from apps.usr.constants import UserRole
 from apps.usr.permissions import IsApprover, IsFinanceOfficer, IsStaffOfficer, IsNotAdmin
-from apps.purchases.models import PurchaseRequest, ApprovalStep, FinanceNote,ApprovalPolicy
-from apps.purchases.constants import PurchaseStatus, ApprovalStatus
+from apps.usr.throttling import WriteIPThrottle, WriteRoleThrottle
+from apps.purchases.models import (
+    ConcurrentUpdate, PurchaseRequest, ApprovalStep, FinanceNote,ApprovalPolicy, ArchivedPurchaseRequest, AuditEvent, PolicyReapplication,
+    ApprovalAssignment,
+)
+from apps.usr.authentication import JWTAuthentication
+from apps.core.db import PRIMARY, ReplicaReadMixin, read_alias
+from apps.core.idempotency import idempotent
+from apps.purchases.constants import PurchaseStatus, ApprovalStatus, AssignmentStatus
+from apps.purchases.events import ListenerUnavailable, broker, is_visible_to
+from apps.purchases.search import search_requests
+from apps.purchases.filters import PurchaseRequestFilter, parse_decimal
+from apps.purchases.policies import matching_policies, simulate
+from apps.purchases.routing import approval_error
+from apps.purchases.sync import changes_since, current_token
+from apps.purchases.archive import archived_payload
+from apps.purchases.readers import ValuesReader, narrow, payload_key, request_payloads
 from apps.purchases.serializers import (
     ApprovalStepSerializer,
     FinanceNoteSerializer,
@@ -16,17 +39,21 @@ from apps.purchases.serializers import (
     PurchaseRequestSerializer,
     FinanceUpdateSerializer,
     ApprovalPolicySerializer,
+    PolicySimulationSerializer,
+    PolicyReapplicationSerializer,
 )
 
 
 
-class PurchaseRequestViewSet(viewsets.GenericViewSet,
+class PurchaseRequestViewSet(ReplicaReadMixin,
+                             viewsets.GenericViewSet,
                              mixins.CreateModelMixin,
                              mixins.UpdateModelMixin,
                              mixins.DestroyModelMixin,
                              mixins.ListModelMixin,
                              mixins.RetrieveModelMixin):
     permission_classes = [IsAuthenticated]
+    primary_actions = ("changes",)  # the settle window assumes an up-to-date database
 
     def get_queryset(self):
         user = self.request.user
@@ -40,6 +67,113 @@ class PurchaseRequestViewSet(viewsets.GenericViewSet,
             return PurchaseRequest.objects.filter(status__in=[ApprovalStatus.APPROVED, ApprovalStatus.REJECTED])
         return PurchaseRequest.objects.none()
 
+    def get_archive_queryset(self):
+        user = self.request.user
+        role = getattr(user, "role", None)
+
+        if role == UserRole.STAFF:
+            return ArchivedPurchaseRequest.objects.filter(created_by=user)
+        elif role in [UserRole.APPROVER, UserRole.FINANCE]:
+            return ArchivedPurchaseRequest.objects.all()
+        return ArchivedPurchaseRequest.objects.none()
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    # partial_update goes through here too
+    @idempotent
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.read_response(self.filter_queryset(self.get_queryset()), self.get_serializer_class())
+
+    def requested_fields(self, serializer_class):
+        """The sparse fieldset from ?fields= / ?expand=, or None for the full representation."""
+        select = getattr(serializer_class, "selected_fields", None)
+        return select(self.request.query_params) if select else None
+
+    def read_response(self, queryset, serializer_class):
+        """Paginated read-only page, built from `.values()` rows when the serializer's fields allow it."""
+        fields = self.requested_fields(serializer_class)
+        reader = ValuesReader.for_serializer(serializer_class, self.get_serializer_context(), fields)
+        if reader is None:
+            kwargs = {} if fields is None else {"fields": fields}
+            page = self.paginate_queryset(queryset)
+            serializer = serializer_class(page, many=True, context=self.get_serializer_context(), **kwargs)
+            return self.get_paginated_response(serializer.data)
+
+        page = self.paginate_queryset(reader.values(queryset))
+        return self.get_paginated_response(reader.represent(page))
+
+    # ----------------- OPTIMISTIC LOCKING -----------------
+    def get_object(self):
+        """Writes sent with If-Match must name the current version (the ETag) of the request."""
+        obj = super().get_object()
+        if_match = self.request.headers.get("If-Match")
+        if self.request.method not in ("GET", "HEAD", "OPTIONS") and if_match and if_match.strip() != "*":
+            tags = {tag.strip().removeprefix("W/").strip('"') for tag in if_match.split(",")}
+            if str(obj.version) not in tags:
+                raise ConcurrentUpdate("The request was changed since you loaded it; reload and try again.")
+            obj.expect_version(obj.version)  # and it must still be current when the write lands
+        return obj
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ConcurrentUpdate):
+            return Response({"error": str(exc)}, status=status.HTTP_412_PRECONDITION_FAILED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        data = getattr(response, "data", None)
+        if response.status_code < 300 and isinstance(data, dict) and "version" in data:
+            response["ETag"] = f'"{data["version"]}"'
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            current = self.get_object()  # only id and version, see filter_queryset
+        except Http404:
+            # Finalized requests moved out by `manage.py archive_requests`
+            archived = self.get_archive_queryset().filter(pk=kwargs.get("pk")).first()
+            if archived is None:
+                raise
+            return Response(archived_payload(archived, request), status=status.HTTP_200_OK)
+
+        serializer_class = self.get_serializer_class()
+        fields = self.requested_fields(serializer_class)
+        loaded = {}
+
+        def render():
+            # from the primary: a lagging replica would store old children under the new generation
+            queryset = self.get_queryset().using(PRIMARY)
+            loaded["instance"] = narrow(queryset, serializer_class, fields).get(pk=current.pk)
+            return dict(self.get_serializer(loaded["instance"]).data)
+
+        data = request_payloads.get_or_set(
+            payload_key(current.version, serializer_class, fields, request.build_absolute_uri("/")),
+            render,
+            scope=current.pk,
+            # changed since the version was read: serve it, but not under the old version's key
+            cacheable=lambda _: loaded["instance"].version == current.version,
+        )
+        return Response(data)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == "retrieve":
+            # the payload comes from request_payloads, or is rendered from a fresh, narrowed load
+            return queryset.only("id", "version")
+        if self.action != "list":
+            return queryset
+
+        role_scoped_fields = {
+            UserRole.STAFF: ["created_by"],
+            UserRole.FINANCE: ["status"],
+        }
+        role = getattr(self.request.user, "role", None)
+        return PurchaseRequestFilter(self.request.query_params, role_scoped_fields.get(role, [])).filter_queryset(queryset)
+
     def get_serializer_class(self):
         user = self.request.user
         role = getattr(user, "role", None)
@@ -59,6 +193,13 @@ class PurchaseRequestViewSet(viewsets.GenericViewSet,
 
         return PurchaseRequestSerializer
 
+    def get_serializer(self, *args, **kwargs):
+        if self.action == "retrieve":
+            fields = self.requested_fields(self.get_serializer_class())
+            if fields is not None:
+                kwargs["fields"] = fields
+        return super().get_serializer(*args, **kwargs)
+
     def get_permissions(self):
         role_permission_map = {
             UserRole.STAFF: [IsStaffOfficer],
@@ -69,8 +210,116 @@ class PurchaseRequestViewSet(viewsets.GenericViewSet,
         self.permission_classes = [IsAuthenticated] + role_permission_map.get(user_role, [])
         return super().get_permissions()
 
+    def get_throttles(self):
+        action_scope_map = {
+            "approve": "approvals",
+            "reject": "approvals",
+            "create": "uploads",
+            "update": "uploads",
+            "partial_update": "uploads",
+        }
+        self.throttle_scope = action_scope_map.get(self.action)
+        if self.throttle_scope:
+            self.throttle_classes = [WriteIPThrottle, WriteRoleThrottle]
+        return super().get_throttles()
+
+    # ----------------- SEARCH -----------------
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        term = request.query_params.get("q", "").strip()
+        if not term:
+            return Response({"error": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return self.read_response(search_requests(self.get_queryset(), term), PurchaseRequestSerializer)
+
+    # ----------------- DELTA SYNC -----------------
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        """
+        Changes after the token `since`. Without it, only returns the current
+        token: take that first, load the list, then sync from the token.
+        """
+        since = request.query_params.get("since")
+        if since is None:
+            return Response({"next": current_token()}, status=status.HTTP_200_OK)
+        try:
+            since = int(since)
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            return Response({"error": "Query parameter 'since' must be a change token."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # tombstones only for requests the role's scope (see get_queryset) could have shown
+        role = getattr(request.user, "role", None)
+        owner = request.user if role == UserRole.STAFF else None
+        statuses = [ApprovalStatus.APPROVED, ApprovalStatus.REJECTED] if role == UserRole.FINANCE else None
+        data = changes_since(since, self.get_queryset(), self.get_serializer_class(), self.get_serializer_context(), owner, statuses)
+        return Response(data, status=status.HTTP_200_OK)
+
+    # ----------------- EXPORT -----------------
+    EXPORT_COLUMNS = ["id", "title", "created_by", "amount", "status", "created_at", "archived"]
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """CSV of live and archived requests visible to the caller, streamed row by row."""
+        live = (
+            self.get_queryset()
+            .using(read_alias())  # streamed after the view returns
+            .order_by("created_at")
+            .values_list("id", "title", "created_by__email", "amount", "status", "created_at")
+            .iterator(chunk_size=2000)
+        )
+        archived = (
+            self.get_archive_queryset()
+            .using(read_alias())
+            .order_by("created_at")
+            .values_list("id", "title", "created_by__email", "amount", "status", "created_at")
+            .iterator(chunk_size=2000)
+        )
+        rows = chain(
+            [self.EXPORT_COLUMNS],
+            (row + (False,) for row in live),
+            (row + (True,) for row in archived),
+        )
+
+        class Echo:
+            def write(self, value):
+                return value
+
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="purchase_requests.csv"'
+        return response
+
+    # ----------------- AUDIT TRAIL -----------------
+    @action(detail=True, methods=["get"])
+    def audit(self, request, pk=None):
+        """Every recorded change of this request and its children, oldest first, as NDJSON."""
+        visible = self.get_queryset().filter(pk=pk).exists() or self.get_archive_queryset().filter(pk=pk).exists()
+        if not visible:
+            raise Http404
+
+        events = (
+            AuditEvent.objects.using(read_alias())  # streamed after the view returns
+            .filter(purchase_request_id=pk)
+            .order_by("id")
+            .values("id", "model", "object_id", "action", "changes", "actor_id", "created_at")
+            .iterator(chunk_size=500)
+        )
+        lines = (json.dumps(event, cls=DjangoJSONEncoder) + "\n" for event in events)
+        return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+
+    # ----------------- ASSIGNMENTS -----------------
+    @action(detail=False, methods=["get"])
+    def assigned(self, request):
+        """PENDING requests routed to the caller, oldest assignment first."""
+        assignments = ApprovalAssignment.objects.filter(approver=request.user, status=AssignmentStatus.OPEN)
+        queryset = PurchaseRequest.objects.filter(pk__in=assignments.values("purchase_request_id")).order_by("created_at", "pk")
+        return self.read_response(queryset, PurchaseRequestSerializer)
+
     # ----------------- APPROVER ACTIONS -----------------
     @action(detail=True, methods=["patch"], permission_classes=[IsAuthenticated, IsApprover])
+    @idempotent
     def approve(self, request, pk=None):
         purchase_request = self.get_object()
 
@@ -85,30 +334,42 @@ class PurchaseRequestViewSet(viewsets.GenericViewSet,
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        ApprovalStep.objects.create(
-            purchase_request=purchase_request,
-            approver=request.user,
-            status=ApprovalStatus.APPROVED,
-            comments=request.data.get("comments", ""),
-            level=next_level
-        )
+        error = approval_error(purchase_request, request.user, next_level)
+        if error:
+            return Response({"error": error}, status=status.HTTP_403_FORBIDDEN)
+
+        # Step, status recompute and outbox event commit together
+        with transaction.atomic():
+            ApprovalStep.objects.create(
+                purchase_request=purchase_request,
+                approver=request.user,
+                status=ApprovalStatus.APPROVED,
+                comments=request.data.get("comments", ""),
+                level=next_level
+            )
 
         return Response({"message": "Request approved"}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["patch"], permission_classes=[IsAuthenticated, IsApprover])
+    @idempotent
     def reject(self, request, pk=None):
         purchase_request = self.get_object()
 
         last_step = purchase_request.approval_steps.order_by("-level").first()
         next_level = (last_step.level + 1) if last_step else 1
 
-        ApprovalStep.objects.create(
-            purchase_request=purchase_request,
-            approver=request.user,
-            status=ApprovalStatus.REJECTED,
-            comments=request.data.get("comments", ""),
-            level=next_level
-        )
+        error = approval_error(purchase_request, request.user, next_level)
+        if error:
+            return Response({"error": error}, status=status.HTTP_403_FORBIDDEN)
+
+        with transaction.atomic():
+            ApprovalStep.objects.create(
+                purchase_request=purchase_request,
+                approver=request.user,
+                status=ApprovalStatus.REJECTED,
+                comments=request.data.get("comments", ""),
+                level=next_level
+            )
 
         return Response({"message": "Request rejected"}, status=status.HTTP_200_OK)
 
@@ -143,6 +404,7 @@ class FinanceNoteViewSet(viewsets.GenericViewSet,
             finance_user=self.request.user
         )
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -177,7 +439,8 @@ class FinanceNoteViewSet(viewsets.GenericViewSet,
 
 
 
-class ApprovalPolicyViewSet(viewsets.GenericViewSet, 
+class ApprovalPolicyViewSet(ReplicaReadMixin,
+                            viewsets.GenericViewSet, 
                             mixins.CreateModelMixin, 
                             mixins.UpdateModelMixin, 
                             mixins.DestroyModelMixin, 
@@ -186,6 +449,7 @@ class ApprovalPolicyViewSet(viewsets.GenericViewSet,
 
     queryset = ApprovalPolicy.objects.all()
     serializer_class = ApprovalPolicySerializer
+    replica_actions = ("simulate",)  # read-only POST
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -226,18 +490,15 @@ class ApprovalPolicyViewSet(viewsets.GenericViewSet,
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
 
-        # OPTIONAL FILTER: match amount
+        # OPTIONAL FILTER: active policies matching amount
         amount = request.query_params.get("amount")
-        serializer_context = {}
-
         if amount:
-            serializer_context["amount"] = amount
+            try:
+                queryset = matching_policies(parse_decimal(amount))
+            except ValueError as e:
+                raise ValidationError({"amount": str(e)})
 
-        serializer = self.get_serializer(
-            queryset,
-            many=True,
-            context=serializer_context
-        )
+        serializer = self.get_serializer(queryset, many=True)
 
         return Response({
                         "message": "Approval policies fetched successfully.",
@@ -252,4 +513,89 @@ class ApprovalPolicyViewSet(viewsets.GenericViewSet,
         return Response({
                         "message": "Approval policy fetched successfully.",
                         "data": serializer.data
-                    }, status=status.HTTP_200_OK)
\ No newline at end of file
+                    }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"])
+    def reapplications(self, request):
+        """Progress of the re-evaluations queued by policy changes, newest first."""
+        jobs = PolicyReapplication.objects.order_by("-pk")[:20]
+        return Response({
+                "message": "Policy re-applications fetched successfully.",
+                "data": PolicyReapplicationSerializer(jobs, many=True).data
+            }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated, IsFinanceOfficer | IsApprover])
+    def simulate(self, request):
+        """Impact of a proposed policy set on existing requests, without touching the live policies."""
+        serializer = PolicySimulationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                    "message": "Invalid policy simulation.",
+                    "errors": serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        queryset = PurchaseRequest.objects.filter(status__in=data["status"])
+        if "amount_min" in data:
+            queryset = queryset.filter(amount__gte=data["amount_min"])
+        if "amount_max" in data:
+            queryset = queryset.filter(amount__lte=data["amount_max"])
+
+        return Response({
+                "message": "Policy simulation completed.",
+                "data": simulate(queryset, serializer.proposed_policies())
+            }, status=status.HTTP_200_OK)
+
+
+
+
+# ----------------- STATUS EVENTS (SSE, served by the ASGI app) -----------------
+SSE_KEEPALIVE_SECONDS = 25
+
+
+async def authenticate_stream(request):
+    """(user, error response); run again on every keep-alive, so an expired or revoked token ends the stream."""
+    try:
+        auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except exceptions.AuthenticationFailed as e:
+        return None, JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    if auth is None:
+        return None, JsonResponse({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+    return auth[0], None
+
+
+async def request_status_stream(request):
+    user, error = await authenticate_stream(request)
+    if error is not None:
+        return error
+
+    async def stream():
+        nonlocal user  # refreshed on keep-alives, e.g. after a role change
+        yield "retry: 5000\n\n"
+        try:
+            queue = await broker.subscribe()
+        except ListenerUnavailable:
+            return  # the client reconnects after the retry delay
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    user, error = await authenticate_stream(request)
+                    if error is not None:  # the client has to log in or refresh before reconnecting
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if event is None:  # listener dropped; let the client reconnect
+                    break
+                if is_visible_to(user, event):
+                    data = {"id": event["id"], "status": event["status"], "previous_status": event["previous_status"]}
+                    yield f"event: status\ndata: {json.dumps(data)}\n\n"
+        finally:
+            broker.unsubscribe(queue)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,22 +1,40 @@
 from rest_framework import authentication, exceptions
 import jwt
-from django.conf import settings
 from django.contrib.auth import get_user_model
+from apps.core.cache import Namespace
+from apps.usr.tokens import ACCESS, ACCESS_COOKIE, decode, is_revoked, password_matches
+
+# users by id, so authenticating a request does not query the database (dropped by apps.usr signals on change)
+user_cache = Namespace("users", timeout=60)
+
+
+def cached_user(user_id):
+    return user_cache.get_or_set(user_id, lambda: get_user_model().objects.filter(id=user_id).first())
+
+
+class TokenRejected(exceptions.AuthenticationFailed):
+    """The token cookies can never work again (revoked, invalid, user gone); see apps.usr.exceptions."""
+
 
 class JWTAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
-        token = request.COOKIES.get('jwt')
+        token = request.COOKIES.get(ACCESS_COOKIE)
         if not token:
             return None  # No JWT provided
 
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = decode(token, ACCESS)
         except jwt.ExpiredSignatureError:
             raise exceptions.AuthenticationFailed('Token has expired')
         except jwt.InvalidTokenError:
-            raise exceptions.AuthenticationFailed('Invalid token')
+            raise TokenRejected('Invalid token')
+
+        if is_revoked(payload):
+            raise TokenRejected('Token has been revoked')
 
-        user = get_user_model().objects.filter(id=payload['user_id']).first()
+        user = cached_user(payload['user_id'])
         if user is None:
-            raise exceptions.AuthenticationFailed('User not found')
-        return (user, None)
+            raise TokenRejected('User not found')
+        if not password_matches(payload, user):
+            raise TokenRejected('Token has been revoked')  # password changed since
+        return (user, payload)
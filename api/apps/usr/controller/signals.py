@@ -1,4 +1,14 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from apps.usr.authentication import user_cache
 
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def drop_cached_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    user_cache.delete(user_id)
+    # again after commit, in case a concurrent request cached the old row meanwhile
+    transaction.on_commit(lambda: user_cache.delete(user_id))
@@ -0,0 +1,13 @@
+from rest_framework.views import exception_handler
+
+from apps.usr.authentication import TokenRejected
+from apps.usr.tokens import clear_token_cookies
+
+
+
+def token_exception_handler(exc, context):
+    """DRF's handler; responses refusing a dead token also clear the cookies, which the browser can't (httponly)."""
+    response = exception_handler(exc, context)
+    if isinstance(exc, TokenRejected) and response is not None:
+        clear_token_cookies(response)
+    return response
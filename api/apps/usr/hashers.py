@@ -0,0 +1,10 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with cost parameters taken from settings (requires argon2-cffi)."""
+    time_cost = settings.ARGON2_TIME_COST
+    memory_cost = settings.ARGON2_MEMORY_COST
+    parallelism = settings.ARGON2_PARALLELISM
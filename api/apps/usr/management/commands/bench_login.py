@@ -0,0 +1,53 @@
+import time
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.usr.serializers import UserLoginSerializer
+
+
+
+class Command(BaseCommand):
+    help = "Measure login throughput (logins/sec) for an existing account."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--role", required=True)
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--compare-legacy", action="store_true",
+                            help="Also time the old check_password + authenticate() path.")
+
+    def handle(self, *args, **options):
+        data = {"email": options["email"], "password": options["password"], "role": options["role"]}
+        iterations = options["iterations"]
+
+        serializer = UserLoginSerializer(data=data)
+        if not serializer.is_valid():
+            raise CommandError(f"Login failed: {serializer.errors}")
+
+        # Hashing cost alone, with the preferred hasher
+        hasher = get_hasher()
+        encoded = make_password(options["password"])
+        started = time.perf_counter()
+        for _ in range(iterations):
+            hasher.verify(options["password"], encoded)
+        self.report(f"hasher ({hasher.algorithm})", iterations, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            UserLoginSerializer(data=data).is_valid(raise_exception=True)
+        self.report("login pipeline", iterations, time.perf_counter() - started)
+
+        if options["compare_legacy"]:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                user = get_user_model().objects.filter(email=data["email"], role=data["role"]).first()
+                user.check_password(data["password"])
+                authenticate(email=data["email"], password=data["password"])
+            self.report("legacy login", iterations, time.perf_counter() - started)
+
+    def report(self, label, iterations, elapsed):
+        self.stdout.write(
+            f"{label:<20} {iterations / elapsed:10.1f} ops/sec  {elapsed / iterations * 1000:8.2f} ms/op"
+        )
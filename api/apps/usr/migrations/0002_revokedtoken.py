@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usr', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=64, unique=True, verbose_name='Token ID')),
+                ('revoked_at', models.DateTimeField(auto_now_add=True, verbose_name='Revoked At')),
+                ('expires_at', models.DateTimeField(verbose_name='Expires At')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revoked_tokens', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='revoked_token_expires_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usr', '0002_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='password_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Password Version'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.auth.hashers import acheck_password, check_password, make_password
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from apps.usr.user_manager import UserManager
@@ -14,6 +15,8 @@ class User(AbstractUser):
     is_active = models.BooleanField(default=True, verbose_name="Is Active")
     is_staff = models.BooleanField(default=False, verbose_name="Is Staff")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    # bumped by every password change, but not by rehashes; tokens carry it (see apps.usr.tokens)
+    password_version = models.PositiveIntegerField(default=0, verbose_name="Password Version")
 
     username = None
 
@@ -28,3 +31,41 @@ class User(AbstractUser):
 
     def __str__(self):
         return "{} {} - {}".format(self.first_name, self.last_name, self.role)
+
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        self.password_version += 1
+
+    def rehash_password(self, raw_password):
+        """Store the same password under the preferred hasher, without ending any login."""
+        self.password = make_password(raw_password)
+        self._password = None
+        self.save(update_fields=["password"])
+
+    def check_password(self, raw_password):
+        return check_password(raw_password, self.password, self.rehash_password)
+
+    async def acheck_password(self, raw_password):
+        async def setter(raw_password):
+            self.password = make_password(raw_password)
+            self._password = None
+            await self.asave(update_fields=["password"])
+
+        return await acheck_password(raw_password, self.password, setter)
+
+
+
+# JWT, or whole login (token family), revoked before its expiry (see apps.usr.tokens)
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=64, unique=True, verbose_name="Token ID")  # a token's jti or a family id
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="revoked_tokens", verbose_name="User")
+    revoked_at = models.DateTimeField(auto_now_add=True, verbose_name="Revoked At")
+    expires_at = models.DateTimeField(verbose_name="Expires At")  # the token's own exp; the row is useless after it
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires_at"], name="revoked_token_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.jti} ({self.user_id})"
@@ -1,4 +1,4 @@
-from django.contrib.auth import authenticate, get_user_model, update_session_auth_hash
+from django.contrib.auth import get_user_model, update_session_auth_hash
 from rest_framework import serializers
 from apps.usr.models import UserRole
 
@@ -44,7 +44,8 @@ class UserLoginSerializer(serializers.Serializer):
         if not email or not password:
             raise serializers.ValidationError({'message': 'Email and password are required.'})
 
-        # Filter user by email and role
+        # Single lookup and a single password verification; check_password also
+        # re-hashes the stored password when the preferred hasher has changed.
         user = get_user_model().objects.filter(email=email, role=role).first()
         
         if user is None:
@@ -56,9 +57,7 @@ class UserLoginSerializer(serializers.Serializer):
         if user.is_superuser:
             raise serializers.ValidationError({'message': 'Access denied!'})
 
-        user = authenticate(email=email, password=password)
-        
-        if user and user.is_active:
+        if user.is_active:
             return {'user': user, 'message': 'Login successful!'}
         
         raise serializers.ValidationError({'message': 'User account not active!'})
@@ -1,3 +1,143 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
 from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.usr.models import User, RevokedToken
+from apps.usr.tokens import ACCESS_COOKIE, REFRESH, REFRESH_COOKIE, REFRESH_REUSE_GRACE_SECONDS, decode
+
+
+LOGIN_URL = "/api/auth/login/"
+LOGOUT_URL = "/api/auth/logout/"
+REFRESH_URL = "/api/auth/refresh/"
+ME_URL = "/api/auth/me/"
+
+
+def clear_caches():
+    # throttle buckets and revocation answers outlive the test's rolled back transaction
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+
+class TokenTests(TestCase):
+    """Logout and refresh rotation end a login (its token family) in every process."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="staff@example.com", password="pw12345678", role="staff", first_name="Sam", last_name="Lee")
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def post(self, url, data=None):
+        # revocations are announced to the other processes (and this one's filter) on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data, format="json")
+
+    def login(self):
+        response = self.post(LOGIN_URL, {"email": "staff@example.com", "password": "pw12345678", "role": "staff"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.cookies[ACCESS_COOKIE].value, response.cookies[REFRESH_COOKIE].value
+
+    def use(self, access="", refresh=""):
+        self.client.cookies[ACCESS_COOKIE] = access
+        self.client.cookies[REFRESH_COOKIE] = refresh
+
+    def test_logout_clears_cookies_and_revokes_the_login(self):
+        access, refresh = self.login()
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_200_OK)
+
+        response = self.post(LOGOUT_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.cookies[ACCESS_COOKIE].value, "")
+        self.assertEqual(response.cookies[REFRESH_COOKIE].value, "")
+
+        self.use(access, refresh)
+        self.assertIn(self.client.get(ME_URL).status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.assertEqual(self.post(REFRESH_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_with_an_expired_access_token_revokes_by_the_refresh_cookie(self):
+        _, refresh = self.login()
+        self.use("expired", refresh)
+
+        self.assertEqual(self.post(LOGOUT_URL).status_code, status.HTTP_200_OK)
+        self.use(refresh=refresh)
+        self.assertEqual(self.post(REFRESH_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_without_cookies_still_clears_them(self):
+        response = self.post(LOGOUT_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.cookies[REFRESH_COOKIE].value, "")
+        self.assertFalse(RevokedToken.objects.exists())
+
+    def test_refresh_rotates_the_refresh_token(self):
+        _, first = self.login()
+        response = self.post(REFRESH_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        second = response.cookies[REFRESH_COOKIE].value
+        self.assertNotEqual(first, second)
+        self.assertEqual(decode(first, REFRESH)["fam"], decode(second, REFRESH)["fam"])
+        self.assertEqual(self.post(REFRESH_URL).status_code, status.HTTP_200_OK)
+
+    def test_reuse_within_the_grace_period_keeps_the_login(self):
+        _, first = self.login()
+        second = self.post(REFRESH_URL).cookies[REFRESH_COOKIE].value
+
+        self.use(refresh=first)  # a second tab refreshing with the same cookie
+        self.assertEqual(self.post(REFRESH_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.use(refresh=second)
+        self.assertEqual(self.post(REFRESH_URL).status_code, status.HTTP_200_OK)
+
+    def test_reuse_after_the_grace_period_revokes_the_family(self):
+        _, first = self.login()
+        second = self.post(REFRESH_URL).cookies[REFRESH_COOKIE].value
+        RevokedToken.objects.filter(jti=decode(first, REFRESH)["jti"]).update(
+            revoked_at=F("revoked_at") - timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS + 1)
+        )
+
+        self.use(refresh=first)  # replayed, e.g. from a leaked cookie
+        self.assertEqual(self.post(REFRESH_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.use(refresh=second)
+        self.assertEqual(self.post(REFRESH_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+
+class LoginThrottleTests(TestCase):
+    """Rates from DEFAULT_THROTTLE_RATES: login_email 5/min, login_role_approver 3/min."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(email="staff@example.com", password="pw12345678", role="staff", first_name="Sam", last_name="Lee")
+        User.objects.create_user(email="approver@example.com", password="pw12345678", role="approver", first_name="Ann", last_name="Bo")
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def attempt(self, email, role, password="wrong-password"):
+        return self.client.post(LOGIN_URL, {"email": email, "password": password, "role": role}, format="json")
+
+    def test_email_bucket(self):
+        for _ in range(5):
+            self.assertEqual(self.attempt("staff@example.com", "staff").status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.attempt("staff@example.com", "staff", password="pw12345678")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+        # other accounts from the same client are not locked out
+        self.assertEqual(self.attempt("approver@example.com", "approver", password="pw12345678").status_code, status.HTTP_200_OK)
+
+    def test_approver_role_rate(self):
+        for _ in range(3):
+            self.assertEqual(self.attempt("approver@example.com", "approver").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.attempt("approver@example.com", "approver").status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_no_role_wide_bucket(self):
+        for _ in range(3):
+            self.attempt("approver@example.com", "approver")
+        # the same role from this client, for another email, has a bucket of its own
+        self.assertEqual(self.attempt("other@example.com", "approver").status_code, status.HTTP_400_BAD_REQUEST)
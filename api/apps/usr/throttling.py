@@ -0,0 +1,199 @@
+import os
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from apps.usr.constants import UserRole
+
+
+# refill, take and store in one step, so concurrent workers can't all spend the same token
+TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_per_second = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill_per_second)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return {allowed, tostring(tokens)}
+"""
+
+# locmem (local runs and tests) updates buckets under a per-process lock, the file-based cache under an
+# flock shared by the workers of the host. Other backends (memcached, database) are not atomic.
+_local_lock = threading.Lock()
+LOCK_FILE = "throttle.lock"
+
+
+@lru_cache(maxsize=None)
+def redis_script(alias):
+    """TAKE_TOKEN_SCRIPT on a client of its own for the cache alias (EVALSHA, loading the script when missing)."""
+    import redis  # only needed with the Redis cache, like RedisCache itself
+
+    location = settings.CACHES[alias]["LOCATION"]
+    if not isinstance(location, str):
+        location = location[0]
+    client = redis.Redis.from_url(location.split(",")[0])  # the first server takes the writes, as in RedisCache
+    return client.register_script(TAKE_TOKEN_SCRIPT)
+
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per (scope, ident). A rate of "20/min" means a burst of 20
+    requests refilled at 20 tokens per minute. Buckets are kept in the
+    THROTTLE_CACHE alias so every worker draws from the same counters.
+    """
+    scope = None
+    timer = time.time
+    durations = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+    def __init__(self):
+        self.cache = caches[settings.THROTTLE_CACHE]
+        self.wait_seconds = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_rate(self, request, view, scope):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+    def get_bucket_ident(self, request, view):
+        raise NotImplementedError(".get_bucket_ident() must be overridden")
+
+    def parse_rate(self, rate):
+        num, period = rate.split("/")
+        try:
+            return int(num), self.durations[period[0]]
+        except (ValueError, KeyError):
+            raise ImproperlyConfigured(f"Invalid throttle rate '{rate}'")
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = self.get_rate(request, view, scope) if scope else None
+        ident = self.get_bucket_ident(request, view) if rate else None
+        if ident is None:
+            return True
+
+        capacity, period = self.parse_rate(rate)
+        refill_per_second = capacity / period
+        key = f"throttle:{scope}:{ident}"
+        now = self.timer()
+
+        allowed, tokens = self.take_token(key, capacity, refill_per_second, now, period)
+        if not allowed:
+            self.wait_seconds = (1 - tokens) / refill_per_second
+        return allowed
+
+    def take_token(self, key, capacity, refill_per_second, now, period):
+        """Refill the bucket up to `now` and take a token if there is one. Returns (allowed, tokens left)."""
+        if isinstance(self.cache, RedisCache):
+            script = redis_script(settings.THROTTLE_CACHE)
+            allowed, tokens = script(keys=[self.cache.make_and_validate_key(key)], args=[capacity, refill_per_second, now, period])
+            return bool(allowed), float(tokens)
+
+        with self.bucket_lock():
+            tokens, updated_at = self.cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0, now - updated_at) * refill_per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.cache.set(key, (tokens, now), period)
+        return allowed, tokens
+
+    @contextmanager
+    def bucket_lock(self):
+        if not isinstance(self.cache, FileBasedCache):
+            with _local_lock:
+                yield
+            return
+        directory = settings.CACHES[settings.THROTTLE_CACHE]["LOCATION"]
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file closes
+            yield
+
+    def wait(self):
+        return self.wait_seconds
+
+
+
+# ----------------- LOGIN -----------------
+class LoginIPThrottle(TokenBucketThrottle):
+    scope = "login_ip"
+
+    def get_bucket_ident(self, request, view):
+        return self.get_ident(request)
+
+
+class LoginEmailThrottle(TokenBucketThrottle):
+    scope = "login_email"
+
+    def get_bucket_ident(self, request, view):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+class LoginRoleThrottle(TokenBucketThrottle):
+    """
+    Attempts per (role, client IP, email), at a rate that can be set per
+    role ("login_role_<role>"), e.g. fewer guesses at approver accounts.
+    Never one bucket per role: anyone could spend it and lock the role out.
+    """
+    scope = "login_role"
+
+    def get_rate(self, request, view, scope):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        return rates.get(f"{scope}_{self.get_role(request)}", rates.get(scope))
+
+    def get_role(self, request):
+        role = request.data.get("role") if hasattr(request.data, "get") else None
+        return role if role in UserRole.values else None  # anything else fails validation before hashing
+
+    def get_bucket_ident(self, request, view):
+        role = self.get_role(request)
+        email = LoginEmailThrottle().get_bucket_ident(request, view)
+        if role is None or email is None:
+            return None
+        return f"{role}:{self.get_ident(request)}:{email}"
+
+
+
+# ----------------- WRITE ENDPOINTS (view.throttle_scope) -----------------
+class WriteIPThrottle(TokenBucketThrottle):
+    def get_scope(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        return f"{scope}_ip" if scope else None
+
+    def get_bucket_ident(self, request, view):
+        return self.get_ident(request)
+
+
+class WriteRoleThrottle(TokenBucketThrottle):
+    """Per-user bucket whose rate can be overridden per role ("<scope>_<role>")."""
+
+    def get_scope(self, request, view):
+        return getattr(view, "throttle_scope", None)
+
+    def get_rate(self, request, view, scope):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        role = getattr(request.user, "role", None)
+        return rates.get(f"{scope}_{role}", rates.get(scope))
+
+    def get_bucket_ident(self, request, view):
+        return request.user.pk if request.user.is_authenticated else None
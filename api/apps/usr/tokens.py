@@ -0,0 +1,192 @@
+"""
+JWT access and refresh tokens, and their revocation.
+
+Access tokens live ACCESS_TOKEN_LIFETIME_MINUTES in the `jwt` cookie.
+Refresh tokens live REFRESH_TOKEN_LIFETIME_DAYS in `jwt_refresh`, which
+is only sent to /api/auth/, and are replaced on every refresh. All tokens
+of one login share a family id (`fam`): logout revokes the family, so its
+access and refresh tokens stop working together. Tokens also carry a
+fingerprint of the user's password version, so a password change ends
+every login without touching the revocation list; rehashing the same
+password (hasher upgrades on login) does not.
+
+Checking a token costs no database query. Each process keeps a bloom
+filter of revoked ids and syncs it from RevokedToken when the shared
+revocation generation moves (one cache read per check). Only ids the
+filter may contain are looked up exactly, through the cache.
+"""
+import time
+import uuid
+import jwt
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from apps.core.bloom import BloomFilter
+from apps.core.cache import Namespace
+from apps.usr.models import RevokedToken
+
+
+ACCESS, REFRESH = "access", "refresh"
+ACCESS_COOKIE = "jwt"
+REFRESH_COOKIE = "jwt_refresh"
+REFRESH_COOKIE_PATH = "/api/auth/"  # refresh/ and logout/
+# a refresh token presented again this soon after its rotation is a concurrent refresh (two tabs), not a replay
+REFRESH_REUSE_GRACE_SECONDS = 30
+
+FILTER_MIN_CAPACITY = 1024
+FILTER_REBUILD_SECONDS = 3600  # drops ids whose tokens expired
+SYNC_OVERLAP_SECONDS = 60  # revocations commit out of revoked_at order
+
+revocation_log = Namespace("revocation_log")  # its generation moves on every revocation
+revoked_cache = Namespace("revoked_tokens", timeout=60)  # exact answers for ids the filter may contain
+
+
+
+# ----------------- ISSUING -----------------
+def password_fingerprint(user):
+    # not the hash itself: a rehash (new hasher or parameters) must not end any login
+    return salted_hmac("apps.usr.tokens.password", f"{user.pk}:{user.password_version}").hexdigest()[:16]
+
+
+def encode(user, token_type, lifetime, family):
+    now = timezone.now()
+    payload = {
+        "user_id": user.id,
+        "type": token_type,
+        "jti": uuid.uuid4().hex,
+        "fam": family,
+        "pwd": password_fingerprint(user),
+        "iat": now,
+        "exp": now + lifetime,
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+
+
+def issue_tokens(user, family=None):
+    """(access, refresh) for `user`; pass `family` to continue a login instead of starting one."""
+    family = family or uuid.uuid4().hex
+    access = encode(user, ACCESS, timedelta(minutes=settings.ACCESS_TOKEN_LIFETIME_MINUTES), family)
+    refresh = encode(user, REFRESH, timedelta(days=settings.REFRESH_TOKEN_LIFETIME_DAYS), family)
+    return access, refresh
+
+
+def set_token_cookies(response, user, family=None):
+    """Issue a token pair into the response cookies. Returns the access token."""
+    access, refresh = issue_tokens(user, family)
+    response.set_cookie(
+        ACCESS_COOKIE,
+        access,
+        httponly=settings.JWT_COOKIE_HTTPONLY,
+        secure=settings.JWT_COOKIE_SECURE,
+        samesite="Lax",
+    )
+    response.set_cookie(
+        REFRESH_COOKIE,
+        refresh,
+        max_age=settings.REFRESH_TOKEN_LIFETIME_DAYS * 86400,
+        path=REFRESH_COOKIE_PATH,
+        httponly=True,
+        secure=settings.JWT_COOKIE_SECURE,
+        samesite="Lax",
+    )
+    return access
+
+
+def clear_token_cookies(response):
+    response.delete_cookie(ACCESS_COOKIE)
+    response.delete_cookie(REFRESH_COOKIE, path=REFRESH_COOKIE_PATH)
+
+
+def decode(token, token_type):
+    """Verified payload of a `token_type` token. Raises jwt.InvalidTokenError (ExpiredSignatureError once expired)."""
+    payload = jwt.decode(
+        token, settings.SECRET_KEY, algorithms=["HS256"], options={"require": ["exp", "jti", "fam", "pwd"]}
+    )
+    if payload.get("type") != token_type:
+        raise jwt.InvalidTokenError("Wrong token type")
+    return payload
+
+
+def password_matches(payload, user):
+    """False once the password changed after the token was issued."""
+    return constant_time_compare(payload["pwd"], password_fingerprint(user))
+
+
+
+# ----------------- REVOCATION -----------------
+_filter = None
+_filter_generation = None
+_filter_built_at = 0.0
+_filter_synced_at = None
+
+
+def revocation_filter():
+    """
+    The process-wide BloomFilter of revoked ids. Rebuilt from the live
+    revocations every FILTER_REBUILD_SECONDS or when full; otherwise only
+    the revocations since the last sync are added when the shared
+    generation moved.
+    """
+    global _filter, _filter_generation, _filter_built_at, _filter_synced_at
+
+    generation = revocation_log.generation()  # before reading rows, so later revocations move it again
+    now = timezone.now()
+    if _filter is None or _filter.full or time.monotonic() - _filter_built_at > FILTER_REBUILD_SECONDS:
+        token_ids = list(RevokedToken.objects.filter(expires_at__gt=now).values_list("jti", flat=True))
+        token_filter = BloomFilter(max(FILTER_MIN_CAPACITY, 2 * len(token_ids)))
+        for token_id in token_ids:
+            token_filter.add(token_id)
+        _filter, _filter_built_at = token_filter, time.monotonic()
+    elif generation != _filter_generation:
+        since = _filter_synced_at - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        for token_id in RevokedToken.objects.filter(revoked_at__gte=since).values_list("jti", flat=True):
+            _filter.add(token_id)
+    else:
+        revocation_log.count(hit=True)
+        return _filter
+
+    revocation_log.count(hit=False)
+    _filter_generation, _filter_synced_at = generation, now
+    return _filter
+
+
+def is_revoked(payload):
+    """Whether the token itself or its login (family) was revoked."""
+    token_filter = revocation_filter()
+    for token_id in (payload["jti"], payload["fam"]):
+        if token_id not in token_filter:
+            continue
+        if revoked_cache.get_or_set(token_id, lambda: RevokedToken.objects.filter(jti=token_id).exists()):
+            return True
+    return False
+
+
+def revoke(token_id, user, expires_at):
+    """Refuse every token whose jti or family is `token_id`, in every process, once the transaction commits."""
+    RevokedToken.objects.get_or_create(jti=token_id, defaults={"user": user, "expires_at": expires_at})
+
+    def announce():
+        revoked_cache.set(token_id, True)
+        revocation_log.invalidate()
+
+    transaction.on_commit(announce)
+
+
+def revoke_token(payload, user):
+    revoke(payload["jti"], user, timezone.now() + timedelta(seconds=max(0, payload["exp"] - time.time())))
+
+
+def revoke_login(payload, user):
+    """Logout: every token of the payload's family, which can't outlive a refresh token issued now."""
+    revoke(payload["fam"], user, timezone.now() + timedelta(days=settings.REFRESH_TOKEN_LIFETIME_DAYS))
+
+
+def revoked_at(token_id):
+    return RevokedToken.objects.filter(jti=token_id).values_list("revoked_at", flat=True).first()
+
+
+def purge_expired():
+    return RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()[0]
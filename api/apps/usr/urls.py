@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from apps.usr.views import (
     UserLoginView,
     UserLogoutView,
+    TokenRefreshView,
     CurrentUserDetailView,
     ChangePasswordView,
 )
@@ -10,6 +11,7 @@ from apps.usr.views import (
 urlpatterns = [
     path('login/', UserLoginView.as_view(), name='login'),
     path('logout/', UserLogoutView.as_view(), name='logout'),
+    path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('me/change_password/', ChangePasswordView.as_view(), name='change_user_password'),
     path("me/", CurrentUserDetailView.as_view(), name="current-user")
 ]
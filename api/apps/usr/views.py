@@ -1,5 +1,6 @@
-from django.conf import settings
-from django.contrib.auth import login, logout, update_session_auth_hash
+import jwt
+from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 from rest_framework import status, generics, viewsets, mixins
 from rest_framework.response import Response
@@ -11,8 +12,25 @@ from apps.usr.serializers import (
     UserSerializer,
     UserChangePasswordSerializer,
 )
-from apps.usr.utils import generate_jwt_token, get_user_from_token
+from apps.usr.utils import get_user_from_token
+from apps.usr.tokens import (
+    ACCESS,
+    ACCESS_COOKIE,
+    REFRESH,
+    REFRESH_COOKIE,
+    REFRESH_REUSE_GRACE_SECONDS,
+    clear_token_cookies,
+    decode,
+    is_revoked,
+    password_fingerprint,
+    password_matches,
+    revoke_login,
+    revoke_token,
+    revoked_at,
+    set_token_cookies,
+)
 from apps.usr.permissions import IsNotAdmin
+from apps.usr.throttling import LoginIPThrottle, LoginEmailThrottle, LoginRoleThrottle
 
 
 
@@ -20,6 +38,8 @@ from apps.usr.permissions import IsNotAdmin
 class UserLoginView(generics.GenericAPIView):
     serializer_class = UserLoginSerializer
     permission_classes = [AllowAny]
+    authentication_classes = []  # a stale cookie must not block logging in again
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle, LoginRoleThrottle]
     
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
@@ -28,19 +48,9 @@ class UserLoginView(generics.GenericAPIView):
             user = validated_data['user']
             message = validated_data['message']
 
-            # Generate JWT token
-            token = generate_jwt_token(user)
-            login(request, user)
+            # Access and refresh token cookies; no session (or last_login write), the API is stateless
             response = Response(status=status.HTTP_200_OK)
-            
-            # Set JWT in an HttpOnly cookie
-            response.set_cookie(
-                key='jwt', 
-                value=token,
-                httponly=settings.JWT_COOKIE_HTTPONLY,
-                secure=settings.JWT_COOKIE_SECURE,
-                samesite='Lax'
-            )
+            token = set_token_cookies(response, user)
 
             response.data = {"message": message, "token": token}
             return response
@@ -53,13 +63,57 @@ class UserLoginView(generics.GenericAPIView):
 # UserLogout View
 class UserLogoutView(generics.GenericAPIView):
     serializer_class = UserLogoutSerializer
-    permission_classes = [IsAuthenticated, IsNotAdmin]
-    
+    permission_classes = [AllowAny]
+    authentication_classes = []  # the access token has usually expired by now; the refresh cookie still names the login
+
     def post(self, request, *args, **kwargs):
-        response = Response(status=status.HTTP_200_OK) 
-        response.delete_cookie('jwt') 
-        logout(request)
-        response.data = {'message': 'Logout success!'}
+        response = Response({'message': 'Logout success!'}, status=status.HTTP_200_OK)
+        clear_token_cookies(response)
+
+        for cookie, token_type in ((REFRESH_COOKIE, REFRESH), (ACCESS_COOKIE, ACCESS)):
+            try:
+                payload = decode(request.COOKIES.get(cookie, ""), token_type)
+            except jwt.InvalidTokenError:
+                continue
+            user = get_user_model().objects.filter(id=payload['user_id']).first()
+            if user is not None:
+                revoke_login(payload, user)  # both tokens carry the same family
+                break
+        return response
+
+
+
+
+# TokenRefresh View: a new token pair for the refresh cookie, which is used up
+class TokenRefreshView(generics.GenericAPIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []  # the access token has usually expired by now
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = decode(request.COOKIES.get(REFRESH_COOKIE, ""), REFRESH)
+        except jwt.InvalidTokenError:
+            return self.refused('Session ended. Please log in again.')
+
+        user = get_user_model().objects.filter(id=payload['user_id'], is_active=True).first()
+        if user is None or not password_matches(payload, user):
+            return self.refused('Session ended. Please log in again.')
+
+        if is_revoked(payload):
+            rotated_at = revoked_at(payload['jti'])
+            if rotated_at is not None and (timezone.now() - rotated_at).total_seconds() > REFRESH_REUSE_GRACE_SECONDS:
+                # an already used refresh token came back: assume it leaked and end that login everywhere
+                revoke_login(payload, user)
+            return self.refused('Session ended. Please log in again.')
+
+        revoke_token(payload, user)
+        response = Response({"message": "Token refreshed"}, status=status.HTTP_200_OK)
+        set_token_cookies(response, user, family=payload['fam'])
+        return response
+
+    def refused(self, message):
+        response = Response({"message": message}, status=status.HTTP_401_UNAUTHORIZED)
+        clear_token_cookies(response)
         return response
 
 
@@ -83,8 +137,10 @@ class ChangePasswordView(generics.UpdateAPIView):
         if serializer.is_valid():
             user.set_password(serializer.validated_data['new_password'])
             user.save()
-            update_session_auth_hash(request, user)
-            return Response({"message": "Password updated successfully"}, status=status.HTTP_200_OK)
+            # tokens carry a password fingerprint: every login ends here, except this one, which gets new tokens
+            response = Response({"message": "Password updated successfully"}, status=status.HTTP_200_OK)
+            set_token_cookies(response, user)
+            return response
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -113,12 +169,16 @@ class CurrentUserDetailView(generics.RetrieveUpdateDestroyAPIView):
         )
 
         if serializer.is_valid():
+            fingerprint = password_fingerprint(user)
             serializer.save()
-            return Response({
+            response = Response({
                 "status": "success",
                 "message": "User profile updated successfully.",
                 "data": serializer.data
             }, status=status.HTTP_200_OK)
+            if password_fingerprint(user) != fingerprint:
+                set_token_cookies(response, user)  # the password changed, which ended the current tokens
+            return response
 
         return Response({
             "status": "error",
@@ -129,8 +189,7 @@ class CurrentUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     def destroy(self, request, *args, **kwargs):
         user = self.get_object()
         user.delete()
-        logout(request)
 
         response = Response({"message": "Account successfully deleted."}, status=status.HTTP_204_NO_CONTENT)
-        response.delete_cookie("jwt")
+        clear_token_cookies(response)
         return response
\ No newline at end of file
@@ -79,6 +79,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # third-party
     "rest_framework",
@@ -86,6 +87,7 @@ INSTALLED_APPS = [
     "corsheaders",
     
     # local
+    'apps.core',
     'apps.usr',
     'apps.purchases',
 ]
@@ -95,16 +97,22 @@ MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     #
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # sessions, CSRF, session auth and messages only run outside API_PATH_PREFIX (apps.core.middleware)
+    'apps.core.middleware.WebOnlySessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'apps.core.middleware.WebOnlyCsrfViewMiddleware',
+    'apps.core.middleware.WebOnlyAuthenticationMiddleware',
+    'apps.purchases.audit.AuditContextMiddleware',
+    'apps.core.db.StickyPrimaryMiddleware',
+    'apps.core.middleware.WebOnlyMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
 
+# Requests under this prefix are stateless: JWT cookie auth, no session or CSRF middleware
+API_PATH_PREFIX = "/api/"
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -148,6 +156,22 @@ DATABASES = {
 if not DATABASES["default"]["NAME"]:
     raise Exception("Database variables missing")
 
+# Read replicas, see apps.core.db: comma-separated "host[:port]" list sharing the primary's credentials
+DATABASE_REPLICAS = []
+for i, replica in enumerate(filter(None, map(str.strip, os.getenv("DATABASE_REPLICA_HOSTS", "").split(","))), start=1):
+    host, _, port = replica.partition(":")
+    DATABASES[f"replica_{i}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{i}")
+
+DATABASE_ROUTERS = ["apps.core.db.ReplicaRouter"]
+# how long a user's reads stay on the primary after they write (cover the replication lag)
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -168,6 +192,24 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# PBKDF2 stays the default; with PASSWORD_HASHER_ARGON2=True (needs argon2-cffi)
+# new passwords use Argon2 and existing hashes are upgraded on the next login.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 2))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 65536))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 1))
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if env_bool("PASSWORD_HASHER_ARGON2", default=False):
+    PASSWORD_HASHERS.insert(0, 'apps.usr.hashers.TunedArgon2PasswordHasher')
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -199,9 +241,54 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 
+# Cache
+# Shared Redis cache when REDIS_URL is set. Without it, CACHE_DIR gives a file-based cache that the
+# workers of one host share; otherwise each process gets its own locmem cache (local/tests).
+# Application code uses it through the namespaces in apps.core.cache.
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_DIR = os.getenv("CACHE_DIR")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "purchases")
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': CACHE_KEY_PREFIX,
+        }
+    }
+elif CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            'KEY_PREFIX': CACHE_KEY_PREFIX,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'KEY_PREFIX': CACHE_KEY_PREFIX,
+        }
+    }
+
+# Cache alias holding the token buckets used by apps.usr.throttling
+THROTTLE_CACHE = os.getenv("THROTTLE_CACHE", "default")
+
+# How long a write sent with an Idempotency-Key is answered from storage (apps.core.idempotency)
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", 24))
+
+
+
+
 JWT_COOKIE_HTTPONLY = env_bool("JWT_COOKIE_HTTPONLY", default=True)
 JWT_COOKIE_SECURE = env_bool("JWT_COOKIE_SECURE", not DEBUG)
 
+# Lifetimes of the access token (`jwt` cookie) and the rotating refresh token (`jwt_refresh`), see apps.usr.tokens
+ACCESS_TOKEN_LIFETIME_MINUTES = int(os.getenv("ACCESS_TOKEN_LIFETIME_MINUTES", 15))
+REFRESH_TOKEN_LIFETIME_DAYS = int(os.getenv("REFRESH_TOKEN_LIFETIME_DAYS", 7))
+
 
 # Django REST Framework configuration
 REST_FRAMEWORK = {
@@ -211,9 +298,34 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'apps.core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'apps.core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'EXCEPTION_HANDLER': 'apps.usr.exceptions.token_exception_handler',
+    # Token-bucket rates ("<burst>/<period>"), see apps.usr.throttling.
+    # "<scope>_<role>" overrides a write scope for one role.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv("THROTTLE_LOGIN_IP", "20/min"),
+        'login_email': os.getenv("THROTTLE_LOGIN_EMAIL", "5/min"),
+        'login_role': os.getenv("THROTTLE_LOGIN_ROLE", "5/min"),
+        'login_role_approver': os.getenv("THROTTLE_LOGIN_ROLE_APPROVER", "3/min"),
+        'login_role_finance': os.getenv("THROTTLE_LOGIN_ROLE_FINANCE", "3/min"),
+        'approvals': os.getenv("THROTTLE_APPROVALS", "30/min"),
+        'approvals_ip': os.getenv("THROTTLE_APPROVALS_IP", "60/min"),
+        'uploads': os.getenv("THROTTLE_UPLOADS", "20/min"),
+        'uploads_ip': os.getenv("THROTTLE_UPLOADS_IP", "40/min"),
+    },
+    # nginx sits in front of gunicorn; take the client address it appends to X-Forwarded-For
+    'NUM_PROXIES': int(os.getenv("NUM_PROXIES", 1)),
 }
 
 
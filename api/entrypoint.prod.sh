@@ -6,6 +6,9 @@ python manage.py collectstatic --noinput
 echo "Applying database migrations..."
 python manage.py migrate --noinput
 
+echo "Creating audit log partitions..."
+python manage.py ensure_audit_partitions
+
 echo "Starting Gunicorn..."
 python -m gunicorn config.wsgi:application \
   --bind 0.0.0.0:8000 \
@@ -1,15 +1,32 @@
 // frontend/app/config/api.ts
 import { API_BASE_URL } from './env';
+import { API_ENDPOINTS } from './endpoints';
 
 interface RequestOptions extends RequestInit {
   skipAuth?: boolean;
+  retried?: boolean;
+}
+
+// Access tokens are short-lived; concurrent requests share one refresh
+let refreshing: Promise<boolean> | null = null;
+
+function refreshTokens(): Promise<boolean> {
+  if (!refreshing) {
+    refreshing = fetch(API_ENDPOINTS.refresh_token, { method: 'POST', credentials: 'include' })
+      .then((response) => response.ok)
+      .catch(() => false)
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
 }
 
 export async function apiRequest<T>(
   endpoint: string,
   options: RequestOptions = {}
 ): Promise<T> {
-  const { skipAuth = false, ...fetchOptions } = options;
+  const { skipAuth = false, retried = false, ...fetchOptions } = options;
 
   // Detect if body is FormData
   const isFormData = fetchOptions.body instanceof FormData;
@@ -50,6 +67,17 @@ export async function apiRequest<T>(
     }
 
     if (!response.ok) {
+      // Expired access token: get a new one with the refresh cookie and try once more
+      if (
+        !skipAuth &&
+        !retried &&
+        typeof responseData === 'object' &&
+        responseData?.detail === 'Token has expired' &&
+        (await refreshTokens())
+      ) {
+        return apiRequest<T>(endpoint, { ...options, retried: true });
+      }
+
       let errorMessage = 'API request failed';
 
       if (typeof responseData === 'object' && responseData !== null) {
@@ -4,6 +4,7 @@ export const API_ENDPOINTS = {
   // Auth endpoints
   login: `${API_BASE_URL}/auth/login/`,
   logout: `${API_BASE_URL}/auth/logout/`,
+  refresh_token: `${API_BASE_URL}/auth/refresh/`,
   user: `${API_BASE_URL}/auth/me/`,
   update_profile: `${API_BASE_URL}/auth/me/`,
   delete_account: `${API_BASE_URL}/auth/me/`,